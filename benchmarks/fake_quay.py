@@ -0,0 +1,327 @@
+"""A stand-in for the Quay REST API, for benchmarking purposes.
+
+This implements (in memory, and only as faithfully as this
+collection needs) the subset of the Quay API that the plugins use.
+It can add latency to every response, and inject throttling (HTTP
+429) and server errors (HTTP 503) at random.
+
+Run it standalone with
+
+    python benchmarks/fake_quay.py --repositories 1000 --latency 0.02
+
+or import it and call `serve()`.
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeQuay:
+    """The in-memory state of the fake Quay server, and its request counters."""
+    page_size = 100
+
+    def __init__ (self, latency=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.repositories = {}    # (namespace, name) -> dict
+        self.mirrors = {}         # (namespace, name) -> dict
+        self.permissions = {}     # (namespace, name, kind, entity) -> role
+        self.robots = {}          # (namespace, fullname) -> dict
+        self.reset_stats()
+
+    def populate (self, organization, repositories=0, robots=0, mirrored_fraction=0.0):
+        for i in range(repositories):
+            name = f"repo{i:05d}"
+            self.repositories[(organization, name)] = dict(
+                namespace=organization, name=name, description=f"Repository {i}",
+                is_public=False, kind="image", state="NORMAL")
+            if i < repositories * mirrored_fraction:
+                self.mirrors[(organization, name)] = dict(
+                    is_enabled=True, external_reference=f"ghcr.io/example/{name}",
+                    robot_username=f"{organization}+mirror", sync_interval=3600,
+                    sync_start_date="2025-01-01T00:00:00Z", skopeo_timeout_interval=600,
+                    sync_status="NEVER_RUN",
+                    root_rule=dict(rule_kind="tag_glob_csv", rule_value=["latest"]))
+        for i in range(robots):
+            self.add_robot(organization, f"robot{i:04d}")
+
+    def add_robot (self, organization, shortname):
+        fullname = f"{organization}+{shortname}"
+        self.robots[(organization, fullname)] = dict(
+            name=fullname, description="", token="T" * 64 + shortname,
+            created="Mon, 01 Jan 2025 00:00:00 -0000", last_accessed=None,
+            unstructured_metadata={})
+        return self.robots[(organization, fullname)]
+
+    def reset_stats (self):
+        with self.lock:
+            self.requests = collections.Counter()
+            self.connections = 0
+            self.bytes_sent = 0
+
+    def stats (self):
+        with self.lock:
+            return dict(
+                requests_total=sum(self.requests.values()),
+                requests=dict(self.requests),
+                connections=self.connections,
+                bytes_sent=self.bytes_sent)
+
+    def handle (self, method, path, query, body):
+        """Returns `(status_code, json_body, extra_headers)`."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.requests[method] += 1
+            roll = self.random.random()
+        if roll < self.throttle_rate:
+            return (429, dict(error_message="Too many requests"), {"Retry-After": "0"})
+        elif roll < self.throttle_rate + self.error_rate:
+            return (503, dict(error_message="Injected failure"), {})
+
+        with self.lock:
+            return self._route(method, path, query, body)
+
+    def _route (self, method, path, query, body):
+        m = re.fullmatch(r"/api/v1/repository", path)
+        if m:
+            if method == "GET":
+                return self._list_repositories(query)
+            elif method == "POST":
+                key = (body["namespace"], body["repository"])
+                if key in self.repositories:
+                    return (400, dict(error_message="Repository already exists"), {})
+                self.repositories[key] = dict(
+                    namespace=key[0], name=key[1], description=body.get("description", ""),
+                    is_public=body.get("visibility") == "public", kind="image", state="NORMAL")
+                return (201, dict(namespace=key[0], name=key[1]), {})
+
+        m = re.fullmatch(r"/api/v1/repository/([^/]+)/([^/]+)(/.*)?", path)
+        if m:
+            return self._route_repository((m.group(1), m.group(2)), m.group(3) or "",
+                                          method, query, body)
+
+        m = re.fullmatch(r"/api/v1/organization/([^/]+)/robots", path)
+        if m and method == "GET":
+            organization = m.group(1)
+            return (200, dict(robots=[dict(robot) for ((o, _), robot) in self.robots.items()
+                                      if o == organization]), {})
+
+        m = re.fullmatch(r"/api/v1/organization/([^/]+)/robots/([^/]+)/permissions", path)
+        if m and method == "GET":
+            (organization, shortname) = m.groups()
+            fullname = f"{organization}+{shortname}"
+            return (200, dict(permissions=[
+                dict(repository=dict(name=r, is_public=self.repositories[(o, r)]["is_public"]), role=role)
+                for ((o, r, kind, entity), role) in self.permissions.items()
+                if o == organization and kind == "user" and entity == fullname
+                and (o, r) in self.repositories]), {})
+
+        m = re.fullmatch(r"/api/v1/organization/([^/]+)/robots/([^/]+)", path)
+        if m:
+            (organization, shortname) = m.groups()
+            key = (organization, f"{organization}+{shortname}")
+            if method == "GET":
+                if key not in self.robots:
+                    return (400, dict(message="Could not find robot with specified username"), {})
+                return (200, self.robots[key], {})
+            elif method == "PUT":
+                if key in self.robots:
+                    return (400, dict(message="Existing robot with name"), {})
+                return (201, self.add_robot(organization, shortname), {})
+            elif method == "DELETE":
+                self.robots.pop(key, None)
+                return (204, None, {})
+
+        return (404, dict(error_message=f"No such endpoint: {method} {path}"), {})
+
+    def _list_repositories (self, query):
+        namespace = query.get("namespace")
+        names = sorted(name for (o, name) in self.repositories if o == namespace)
+        start = int(query.get("next_page") or 0)
+        page = dict(repositories=[dict(self.repositories[(namespace, name)])
+                                  for name in names[start:start + self.page_size]])
+        if start + self.page_size < len(names):
+            page["next_page"] = str(start + self.page_size)
+        return (200, page, {})
+
+    def _route_repository (self, key, rest, method, query, body):
+        if key not in self.repositories:
+            return (404, dict(error_message="Not Found"), {})
+
+        if rest == "":
+            if method == "GET":
+                return (200, self.repositories[key], {})
+            elif method == "PUT":
+                self.repositories[key]["description"] = body.get("description", "")
+                return (200, dict(success=True), {})
+            elif method == "DELETE":
+                del self.repositories[key]
+                self.mirrors.pop(key, None)
+                return (204, None, {})
+
+        elif rest == "/changevisibility" and method == "POST":
+            self.repositories[key]["is_public"] = body["visibility"] == "public"
+            return (200, dict(success=True), {})
+
+        elif rest == "/mirror":
+            if method == "GET":
+                if key not in self.mirrors:
+                    return (404, dict(error_message="No mirror configuration found"), {})
+                mirror = dict(self.mirrors[key])
+                # Pretend that synchronizations progress every time someone looks:
+                self.mirrors[key]["sync_status"] = dict(
+                    SYNC_NOW="SYNCING", SYNCING="SUCCESS").get(
+                        mirror["sync_status"], mirror["sync_status"])
+                return (200, mirror, {})
+            elif method in ("POST", "PUT"):
+                mirror = dict(self.mirrors.get(key, {}), sync_status="NEVER_RUN")
+                mirror.update(body)
+                self.mirrors[key] = mirror
+                return (201, mirror, {})
+
+        elif rest == "/mirror/sync-now" and method == "POST":
+            if key not in self.mirrors:
+                return (404, dict(error_message="No mirror configuration found"), {})
+            self.mirrors[key]["sync_status"] = "SYNC_NOW"
+            return (204, None, {})
+
+        m = re.fullmatch(r"/permissions/(user|team)/", rest)
+        if m and method == "GET":
+            kind = m.group(1)
+            return (200, dict(permissions={
+                entity: dict(name=entity, role=role, is_robot="+" in entity)
+                for ((o, r, k, entity), role) in self.permissions.items()
+                if (o, r) == key and k == kind}), {})
+
+        m = re.fullmatch(r"/permissions/(user|team)/([^/]+)", rest)
+        if m:
+            pkey = key + m.groups()
+            if method == "GET":
+                if pkey not in self.permissions:
+                    return (400, dict(message="User does not have permission for repo."), {})
+                return (200, dict(name=pkey[3], role=self.permissions[pkey]), {})
+            elif method == "PUT":
+                self.permissions[pkey] = body["role"]
+                return (200, dict(name=pkey[3], role=body["role"]), {})
+            elif method == "DELETE":
+                self.permissions.pop(pkey, None)
+                return (204, None, {})
+
+        return (404, dict(error_message=f"No such endpoint: {method} {rest}"), {})
+
+
+def _make_handler (quay):
+    class Handler (BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # Keep-alive
+
+        def setup (self):
+            super().setup()
+            with quay.lock:
+                quay.connections += 1
+
+        def log_message (self, *args):
+            pass
+
+        def _serve (self):
+            url = urlparse(self.path)
+            query = {k: v[0] for (k, v) in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            body = json.loads(raw) if raw else None
+
+            (status, payload, headers) = quay.handle(self.command, url.path, query, body)
+
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for (k, v) in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+            with quay.lock:
+                quay.bytes_sent += len(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+    return Handler
+
+
+def make_certificate (directory):
+    """Create a self-signed certificate for 127.0.0.1 and localhost with `openssl`.
+
+    Returns `(certfile, keyfile)`.
+    """
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", keyfile, "-out", certfile, "-days", "1",
+         "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True)
+    return (certfile, keyfile)
+
+
+def serve (quay, port=0, certdir=None):
+    """Serve `quay` over HTTPS on 127.0.0.1 in a background thread.
+
+    Returns `(server, certfile)`; the port is `server.server_address[1]`.
+    Clients should trust `certfile` (e.g. through the
+    `REQUESTS_CA_BUNDLE` environment variable).
+    """
+    certdir = certdir or tempfile.mkdtemp(prefix="fake-quay-")
+    (certfile, keyfile) = make_certificate(certdir)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(quay))
+    server.daemon_threads = True
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, certfile)
+
+
+def main ():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--organization", default="bench")
+    parser.add_argument("--repositories", type=int, default=100)
+    parser.add_argument("--robots", type=int, default=10)
+    parser.add_argument("--mirrored-fraction", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests failing with 429")
+    args = parser.parse_args()
+
+    quay = FakeQuay(latency=args.latency, error_rate=args.error_rate,
+                    throttle_rate=args.throttle_rate)
+    quay.populate(args.organization, repositories=args.repositories, robots=args.robots,
+                  mirrored_fraction=args.mirrored_fraction)
+    (server, certfile) = serve(quay, port=args.port)
+    print(f"Serving on https://127.0.0.1:{server.server_address[1]}/ (CA bundle: {certfile})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(quay.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
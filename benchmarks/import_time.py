@@ -0,0 +1,117 @@
+"""Measure how long each of the collection's plugins takes to import.
+
+Ansible imports action and lookup plugins afresh in every forked
+worker, i.e. once per task and host; this overhead therefore adds up
+over loops and large inventories. For each plugin, this script imports
+it into `--repeat` fresh Python processes (in which `ansible` itself is
+already loaded, like in an Ansible worker) and reports the median and
+minimum import time.
+
+    python benchmarks/import_time.py --json before.json
+    # ... hack hack hack ...
+    python benchmarks/import_time.py --baseline before.json
+
+`--top N` additionally shows the N slowest modules that each plugin
+pulls in, as per `python -X importtime`.
+
+Requirements: `ansible-core`, `requests` and the `epfl_si.actions`
+collection must be installed.
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run_benchmarks import REPO_ROOT, collections_path  # noqa: E402
+
+# Imports the module named by argv[2] out of the collections in argv[1], and
+# prints how long that took (in seconds) on stdout.
+SAMPLE = """
+import importlib, sys, time
+from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+_AnsibleCollectionFinder(paths=sys.argv[1].split(":"))._install()
+import ansible.plugins.action, ansible.plugins.lookup, ansible.plugins.filter
+started = time.perf_counter()
+importlib.import_module(sys.argv[2])
+print(time.perf_counter() - started)
+"""
+
+
+def plugin_modules ():
+    for kind in ("action", "lookup", "filter"):
+        for path in sorted(glob.glob(os.path.join(REPO_ROOT, "plugins", kind, "*.py"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name != "__init__":
+                yield f"ansible_collections.epfl_si.quay.plugins.{kind}.{name}"
+
+
+def sample (module, paths, importtime=False):
+    completed = subprocess.run(
+        [sys.executable] + (["-X", "importtime"] if importtime else []) +
+        ["-c", SAMPLE, paths, module],
+        capture_output=True, text=True, check=True)
+    return (float(completed.stdout.strip().splitlines()[-1]), completed.stderr)
+
+
+def slowest_imports (importtime_output, top):
+    """The `top` modules with the highest self time, out of `-X importtime` output."""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        (self_us, _, name) = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main ():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results previously saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="quay-bench-") as workdir:
+        paths = collections_path(workdir)
+        print(f"{'plugin':60} {'median (ms)':>12} {'min (ms)':>9}")
+        for module in plugin_modules():
+            timings = [sample(module, paths)[0] for _ in range(args.repeat)]
+            result = dict(plugin=module.split(".plugins.", 1)[1],
+                          median_ms=round(statistics.median(timings) * 1000, 2),
+                          min_ms=round(min(timings) * 1000, 2))
+            results.append(result)
+            print(f"{result['plugin']:60} {result['median_ms']:>12} {result['min_ms']:>9}")
+            if args.top:
+                for (self_us, name) in slowest_imports(sample(module, paths, importtime=True)[1], args.top):
+                    print(f"    {self_us / 1000:>8.2f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = {r["plugin"]: r for r in json.load(f)}
+        for result in results:
+            before = previous.get(result["plugin"])
+            if before is not None and result["median_ms"] > before["median_ms"] * (1 + args.tolerance):
+                print(f"REGRESSION: {result['plugin']}: {result['median_ms']} ms, was {before['median_ms']} ms",
+                      file=sys.stderr)
+                status = 1
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Benchmark the collection's plugins against a local fake Quay server.
+
+Every scenario runs a real `ansible-playbook` (so that per-task
+overhead is accounted for) against `fake_quay.FakeQuay`, and reports
+wall-clock time, the number of API requests and TCP connections that
+the fake server saw, and the peak RSS of the Ansible processes.
+
+    python benchmarks/run_benchmarks.py --sizes 100,1000,10000 --latency 0.01
+
+Use `--json results.json` to save the results, and `--baseline
+results.json` to fail (with exit code 1) if any scenario now makes
+more API requests, or is slower, than in a previous run (by more than
+the respective `--*-tolerance`).
+
+Requirements: `ansible-core`, `requests` and the `epfl_si.actions`
+collection must be installed; `openssl` must be in the `PATH`.
+"""
+
+import abc
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_quay import FakeQuay, serve  # noqa: E402
+
+ORGANIZATION = "bench"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs its arguments as a subprocess, then prints the peak RSS (in KiB) of said
+# subprocess and all its descendants on stderr.
+PEAK_RSS_LAUNCHER = """
+import resource, subprocess, sys
+status = subprocess.call(sys.argv[1:])
+sys.stderr.write("\\nPEAK_RSS_KB=%d\\n" % resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+sys.exit(status)
+"""
+
+
+def repository_names (size):
+    return [f"repo{i:05d}" for i in range(size)]
+
+
+class Scenario (abc.ABC):
+    """One benchmark: some initial fake Quay state, and some Ansible tasks."""
+    name = None
+
+    def __init__ (self, size, loop_cap):
+        self.size = size
+        self.loop_cap = loop_cap
+
+    def populate (self, quay):
+        quay.populate(ORGANIZATION, repositories=self.size, robots=min(self.size, self.loop_cap))
+
+    @abc.abstractmethod
+    def tasks (self):
+        """The list of Ansible tasks to run against the fake Quay server."""
+
+
+class QuayRepositoriesNoop (Scenario):
+    name = "quay_repositories (no-op)"
+
+    def tasks (self):
+        return [dict(name=self.name, **{"epfl_si.quay.quay_repositories": dict(
+            organization=ORGANIZATION,
+            repositories=[dict(name=name, description=f"Repository {i}", visibility="private")
+                          for (i, name) in enumerate(repository_names(self.size))])})]
+
+
+class QuayRepositoriesChanges (Scenario):
+    name = "quay_repositories (10% changed)"
+
+    def tasks (self):
+        desired = [dict(name=name,
+                        description=(f"Repository {i}" if i % 10 else f"Changed {i}"),
+                        visibility="private")
+                   for (i, name) in enumerate(repository_names(self.size))]
+        return [dict(name=self.name, **{"epfl_si.quay.quay_repositories": dict(
+            organization=ORGANIZATION, repositories=desired)})]
+
+
+class QuayRepositoryLoop (Scenario):
+    name = "quay_repository (loop)"
+
+    def tasks (self):
+        return [dict(name=self.name,
+                     loop=list(range(min(self.size, self.loop_cap))),
+                     **{"epfl_si.quay.quay_repository": dict(
+                         organization=ORGANIZATION,
+                         name="{{ 'repo%05d' % item }}",
+                         description="Repository {{ item }}",
+                         visibility="private")})]
+
+
+class RobotAccountLoop (Scenario):
+    name = "robot_account (loop, create)"
+
+    def populate (self, quay):
+        quay.populate(ORGANIZATION, repositories=self.size)
+
+    def tasks (self):
+        return [dict(name=self.name,
+                     loop=list(range(min(self.size, self.loop_cap))),
+                     **{"epfl_si.quay.robot_account": dict(
+                         organization=ORGANIZATION,
+                         short_name="{{ 'robot%04d' % item }}")})]
+
+
+class RobotAccountsBulk (Scenario):
+    name = "robot_accounts (bulk, create)"
+
+    def populate (self, quay):
+        quay.populate(ORGANIZATION, repositories=self.size)
+
+    def tasks (self):
+        return [dict(name=self.name, no_log=True, **{"epfl_si.quay.robot_accounts": dict(
+            organization=ORGANIZATION,
+            robots=[f"robot{i:04d}" for i in range(min(self.size, self.loop_cap))])})]
+
+
+class RobotAccountPermissionBulk (Scenario):
+    name = "robot_account_permission (bulk)"
+
+    def tasks (self):
+        return [dict(name=self.name, **{"epfl_si.quay.robot_account_permission": dict(
+            organization=ORGANIZATION,
+            robot_account_name=f"{ORGANIZATION}+robot0000",
+            repositories=repository_names(self.size),
+            permission="read")})]
+
+
+class RobotAccountPermissionLoop (Scenario):
+    name = "robot_account_permission (loop)"
+
+    def tasks (self):
+        return [dict(name=self.name,
+                     loop=list(range(min(self.size, self.loop_cap))),
+                     **{"epfl_si.quay.robot_account_permission": dict(
+                         organization=ORGANIZATION,
+                         robot_account_name=f"{ORGANIZATION}+robot0000",
+                         repository_name="{{ 'repo%05d' % item }}",
+                         permission="read")})]
+
+
+class RobotAccountLookup (Scenario):
+    name = "robot_account lookup (loop)"
+
+    def tasks (self):
+        return [dict(name=self.name,
+                     loop=list(range(min(self.size, self.loop_cap))),
+                     **{"ansible.builtin.set_fact": dict(
+                         _robot="{{ lookup('epfl_si.quay.robot_account', '%s', 'bench+robot%%04d' %% item) }}"
+                         % ORGANIZATION)})]
+
+
+class QuayMirrorSync (Scenario):
+    name = "quay_mirror_sync (wait)"
+
+    def populate (self, quay):
+        quay.populate(ORGANIZATION, repositories=self.size, mirrored_fraction=1.0)
+
+    def tasks (self):
+        # The fake server advances a synchronization every time it is polled,
+        # so that this measures the orchestration overhead (concurrency cap
+        # and polling), not the duration of actual synchronizations.
+        return [dict(name=self.name, **{"epfl_si.quay.quay_mirror_sync": dict(
+            organization=ORGANIZATION,
+            repositories=repository_names(min(self.size, self.loop_cap)),
+            max_concurrent_syncs=25,
+            poll_interval=1,
+            max_poll_interval=1)})]
+
+
+SCENARIOS = [QuayRepositoriesNoop, QuayRepositoriesChanges, QuayRepositoryLoop,
+             RobotAccountLoop, RobotAccountsBulk, RobotAccountPermissionBulk,
+             RobotAccountPermissionLoop, RobotAccountLookup, QuayMirrorSync]
+
+
+def collections_path (workdir):
+    """An `ANSIBLE_COLLECTIONS_PATH` that has this checkout as `epfl_si.quay`."""
+    namespace_dir = os.path.join(workdir, "ansible_collections", "epfl_si")
+    os.makedirs(namespace_dir, exist_ok=True)
+    os.symlink(REPO_ROOT, os.path.join(namespace_dir, "quay"))
+    existing = os.environ.get("ANSIBLE_COLLECTIONS_PATH",
+                              os.path.expanduser("~/.ansible/collections") + ":/usr/share/ansible/collections")
+    return f"{workdir}:{existing}"
+
+
+def run_scenario (scenario, args, workdir):
+    quay = FakeQuay(latency=args.latency, error_rate=args.error_rate,
+                    throttle_rate=args.throttle_rate)
+    scenario.populate(quay)
+    (server, certfile) = serve(quay, certdir=workdir)
+    try:
+        playbook = [dict(
+            hosts="localhost", connection="local", gather_facts=False,
+            vars=dict(ansible_quay_hostname=f"127.0.0.1:{server.server_address[1]}",
+                      ansible_quay_bearer_token="benchmark",
+                      **args.extra_vars),
+            tasks=scenario.tasks())]
+        playbook_path = os.path.join(workdir, "playbook.yml")
+        with open(playbook_path, "w") as f:
+            json.dump(playbook, f)   # JSON is YAML
+
+        env = dict(os.environ,
+                   ANSIBLE_COLLECTIONS_PATH=collections_path(workdir),
+                   REQUESTS_CA_BUNDLE=certfile,
+                   ANSIBLE_LOCALHOST_WARNING="false",
+                   ANSIBLE_INVENTORY_UNPARSED_WARNING="false",
+                   ANSIBLE_STDOUT_CALLBACK="default")
+
+        quay.reset_stats()
+        started = time.monotonic()
+        completed = subprocess.run(
+            [sys.executable, "-c", PEAK_RSS_LAUNCHER,
+             "ansible-playbook", "-i", "localhost,", playbook_path],
+            env=env, capture_output=True, text=True)
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+
+    peak_rss_kb = None
+    for line in completed.stderr.splitlines():
+        if line.startswith("PEAK_RSS_KB="):
+            peak_rss_kb = int(line.split("=", 1)[1])
+
+    stats = quay.stats()
+    return dict(
+        scenario=scenario.name,
+        size=scenario.size,
+        ok=completed.returncode == 0,
+        wall_seconds=round(elapsed, 3),
+        requests_total=stats["requests_total"],
+        requests=stats["requests"],
+        connections=stats["connections"],
+        peak_rss_mb=round(peak_rss_kb / 1024, 1) if peak_rss_kb else None,
+        output=None if completed.returncode == 0 else completed.stdout[-4000:] + completed.stderr[-4000:])
+
+
+def compare_with_baseline (results, baseline, args):
+    """Returns the list of regressions, as human-readable strings."""
+    previous = {(r["scenario"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["size"]))
+        if before is None:
+            continue
+        label = f"{result['scenario']} @ {result['size']}"
+        if result["requests_total"] > before["requests_total"] * (1 + args.requests_tolerance):
+            regressions.append(f"{label}: {result['requests_total']} requests, was {before['requests_total']}")
+        if result["wall_seconds"] > before["wall_seconds"] * (1 + args.time_tolerance):
+            regressions.append(f"{label}: {result['wall_seconds']}s, was {before['wall_seconds']}s")
+    return regressions
+
+
+def main ():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--sizes", default="100,1000",
+                        help="comma-separated numbers of repositories in the organization (100 to 50000)")
+    parser.add_argument("--scenarios", default=None,
+                        help="comma-separated substrings of the scenarios to run (default: all)")
+    parser.add_argument("--loop-cap", type=int, default=100,
+                        help="maximum number of iterations for one-task-per-item scenarios")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("-e", "--extra-var", action="append", default=[], metavar="KEY=VALUE",
+                        help="additional playbook variable, e.g. ansible_quay_max_in_flight=16")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results previously saved with --json")
+    parser.add_argument("--requests-tolerance", type=float, default=0.0)
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    args.extra_vars = dict(kv.split("=", 1) for kv in args.extra_var)
+
+    scenarios = [cls for cls in SCENARIOS
+                 if args.scenarios is None
+                 or any(s in cls.name for s in args.scenarios.split(","))]
+
+    results = []
+    print(f"{'scenario':40} {'size':>6} {'wall (s)':>9} {'requests':>9} {'conns':>6} {'RSS (MB)':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for cls in scenarios:
+            with tempfile.TemporaryDirectory(prefix="quay-bench-") as workdir:
+                result = run_scenario(cls(size, args.loop_cap), args, workdir)
+            results.append(result)
+            print(f"{result['scenario']:40} {result['size']:>6} {result['wall_seconds']:>9} "
+                  f"{result['requests_total']:>9} {result['connections']:>6} "
+                  f"{result['peak_rss_mb'] or '?':>9}{'' if result['ok'] else '  FAILED'}")
+            if not result["ok"]:
+                print(result["output"], file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0 if all(r["ok"] for r in results) else 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            status = 1
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
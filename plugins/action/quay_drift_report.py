@@ -0,0 +1,188 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.compare import is_substruct
+from ansible_collections.epfl_si.actions.plugins.module_utils.strings import is_same_string
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, returns_none_on_404
+from ansible_collections.epfl_si.quay.plugins.module_utils.permissions import PermissionChange, PermissionIndex
+from ansible_collections.epfl_si.quay.plugins.module_utils.repositories import desired_mirror_data
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Compare an organization's repositories, robots and permissions with the desired state.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_drift_report.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_checks()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}"
+
+    def perform_checks (self):
+        # Conflicting desired states make for a meaningless report:
+        unique = [
+            self.check_unique(self.args.get("repositories", []), "repositories",
+                              key=lambda r: r["name"]),
+            self.check_unique(self.args.get("robots", []), "robots",
+                              key=lambda r: r["short_name"] if isinstance(r, dict) else r),
+            self.check_unique(self.args.get("permissions", []), "permissions",
+                              key=lambda p: f"{p['repository']}/{p['robot']}")]
+        if not all(unique):
+            return
+
+        drift = {}
+        if "repositories" in self.args:
+            drift["repositories"], drift["mirrors"] = self.repository_drift(self.args["repositories"])
+        if "robots" in self.args:
+            drift["robots"] = self.robot_drift(self.args["robots"])
+        if "permissions" in self.args:
+            drift["permissions"] = self.permission_drift(self.args["permissions"])
+
+        self.result["drift"] = drift
+        self.result["drift_detected"] = any(
+            entries for section in drift.values() for entries in section.values())
+        if self.result["drift_detected"] and self.args.get("fail_on_drift", False):
+            self.failed("drift detected")
+
+    def repository_drift (self, desired_repositories):
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepos
+        current = {r["name"]: r for r in self.quay_request.paginate(
+            "/api/v1/repository", "repositories", params=dict(namespace=self.organization))}
+
+        repositories = dict(missing=[], unexpected=[], changed=[])
+        mirrors = dict(missing=[], changed=[])
+        to_check_mirror = []
+        desired_names = set()
+        for desired in desired_repositories:
+            name = desired["name"]
+            desired_names.add(name)
+            exists = current.get(name)
+            if desired.get("state", "present") == "absent":
+                if exists is not None:
+                    repositories["unexpected"].append(name)
+                continue
+            elif exists is None:
+                repositories["missing"].append(name)
+                continue
+
+            visibility = desired.get("visibility", "private")
+            if not is_same_string(exists["description"], desired["description"]):
+                repositories["changed"].append(dict(
+                    name=name, field="description",
+                    expected=desired["description"], actual=exists["description"]))
+            if exists["is_public"] != is_same_string(visibility, "public"):
+                repositories["changed"].append(dict(
+                    name=name, field="visibility",
+                    expected=visibility, actual="public" if exists["is_public"] else "private"))
+            if desired.get("mirror") is not None:
+                to_check_mirror.append(desired)
+
+        if self.args.get("exclusive", False):
+            repositories["unexpected"].extend(
+                name for name in current if name not in desired_names)
+
+        request = self.quay_request
+        get_mirror = returns_none_on_404(
+            lambda name: request.get(f"/api/v1/repository/{self.organization}/{name}/mirror").json())
+        executor = self.quay_executor()
+        for desired in to_check_mirror:
+            executor.submit(desired["name"], get_mirror, desired["name"])
+        outcomes = executor.run()
+        for desired in to_check_mirror:
+            name = desired["name"]
+            outcome = outcomes[name]
+            if outcome.error is not None:
+                self.failed(f"GET mirror of {name}", outcome.error)
+            elif outcome.value is None:
+                mirrors["missing"].append(name)
+            else:
+                expected = desired_mirror_data(desired["mirror"], outcome.value)
+                if not is_substruct(expected, outcome.value):
+                    mirrors["changed"].append(dict(
+                        name=name, expected=expected,
+                        actual={k: outcome.value.get(k) for k in expected}))
+
+        return repositories, mirrors
+
+    def robot_drift (self, desired_robots):
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#getorgrobots
+        current = set(robot["name"] for robot in self.quay_request.paginate(
+            f"/api/v1/organization/{self.organization}/robots", "robots",
+            params=dict(token="false")))
+
+        desired = {}
+        for robot in desired_robots:
+            if not isinstance(robot, dict):
+                robot = dict(short_name=robot)
+            desired[f"{self.organization}+{robot['short_name']}"] = robot.get("state", "present")
+
+        return dict(
+            missing=[name for (name, state) in desired.items()
+                     if state != "absent" and name not in current],
+            unexpected=[name for (name, state) in desired.items()
+                        if state == "absent" and name in current] + (
+                            [name for name in sorted(current) if name not in desired]
+                            if self.args.get("exclusive", False) else []))
+
+    def permission_drift (self, desired_permissions):
+        """Check robot permissions, reading each robot's permissions once across the organization."""
+        desired = [PermissionChange(p["repository"], "user", p["robot"],
+                                    None if p.get("state", "present") == "absent"
+                                    else p.get("permission", "read"))
+                   for p in desired_permissions]
+        robots = sorted(set(change.name for change in desired))
+
+        request = self.quay_request
+        executor = self.quay_executor()
+        for robot in robots:
+            shortname = robot.split("+", 1)[-1]
+            executor.submit(robot, lambda s: list(request.paginate(
+                f"/api/v1/organization/{self.organization}/robots/{s}/permissions",
+                "permissions")), shortname)
+
+        index = PermissionIndex()
+        for robot, outcome in executor.run().items():
+            if outcome.error is not None:
+                self.failed(f"GET permissions of {robot}", outcome.error)
+            else:
+                index.add_robot_permissions(robot, outcome.value)
+
+        drift = dict(missing=[], changed=[], unexpected=[])
+        for change in desired:
+            try:
+                actual = index.get(change.repository, change.kind, change.name)
+            except KeyError:
+                continue   # Failed to fetch; already reported
+            entry = dict(robot=change.name, repository=change.repository,
+                         expected=change.role, actual=actual)
+            if actual == change.role:
+                continue
+            elif change.role is None:
+                drift["unexpected"].append(entry)
+            elif actual is None:
+                drift["missing"].append(entry)
+            else:
+                drift["changed"].append(entry)
+
+        if self.args.get("exclusive", False):
+            listed = set((change.name, change.repository) for change in desired)
+            for robot in robots:
+                for repository in index.holders("user", robot):
+                    if (robot, repository) not in listed:
+                        drift["unexpected"].append(dict(
+                            robot=robot, repository=repository, expected=None,
+                            actual=index.get(repository, "user", robot)))
+        return drift
@@ -0,0 +1,62 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.mirror_sync import MirrorSyncOrchestrator
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Synchronize the mirrors of many repositories, and (optionally) wait for completion.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_mirror_sync.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_changes()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"mirrors of {self.quay_hostname}/{self.organization}"
+
+    def perform_changes (self):
+        if not self.check_unique(self.args["repositories"], "repositories"):
+            return
+        repositories = self.only_retrying(self.args["repositories"])
+        if self.check_mode:
+            for repository in repositories:
+                self.changed(f"{repository}: sync requested")
+            return
+
+        orchestrator = MirrorSyncOrchestrator(
+            self.quay_request, self.organization,
+            max_concurrent_syncs=self.args.get("max_concurrent_syncs", 5),
+            timeout=self.args.get("timeout", 3600),
+            poll_interval=self.args.get("poll_interval", 5),
+            max_poll_interval=self.args.get("max_poll_interval", 60),
+            max_in_flight=self.quay_max_in_flight)
+        outcomes = orchestrator.run(repositories, wait=self.args.get("wait", True))
+
+        self.result["mirrors"] = {
+            repository: dict(outcome, error=str(outcome["error"])) if "error" in outcome else outcome
+            for repository, outcome in outcomes.items()}
+        for repository in repositories:
+            outcome = outcomes[repository]
+            if outcome["status"] in ("SUCCESS", "TRIGGERED"):
+                self.changed(f"{repository}: {outcome['status']} in {outcome['seconds']}s")
+                self.succeeded(repository)
+            else:
+                self.failed(f"{repository}: sync-now",
+                            outcome.get("error", f"{outcome['status']} after {outcome['seconds']}s"),
+                            item=repository,
+                            # Quay may just be busy; the next run gets a fresh `timeout`:
+                            retryable=True if outcome["status"] == "TIMEOUT" else None)
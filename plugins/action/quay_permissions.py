@@ -0,0 +1,158 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.permissions import PermissionChange, PermissionIndex, permission_snapshot_key
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Synchronize the team and robot permissions of many repositories at once.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_permissions.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_changes()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}"
+
+    def perform_changes (self):
+        desired = self.desired_permissions()
+        if not self.check_unique(desired, "permissions", key=self._item):
+            return
+        desired = self.only_retrying(desired, key=self._item)
+        # Revoking unlisted permissions needs the complete list:
+        exclusive = self.args.get("exclusive", False) and self.items_to_retry is None
+
+        tables = sorted(set((change.repository, change.kind) for change in desired))
+        if exclusive:
+            # Both tables of every mentioned repository:
+            tables = sorted(set((repository, kind)
+                                for (repository, _) in tables
+                                for kind in ("team", "user")))
+
+        (index, unknown) = self.get_permission_index(tables)
+        for change in desired:
+            if (change.repository, change.kind) in unknown:
+                self.failed(f"GET {change.kind} permissions of {change.repository}",
+                            unknown[(change.repository, change.kind)], item=self._item(change))
+        desired = [change for change in desired
+                   if (change.repository, change.kind) not in unknown]
+        tables = [table for table in tables if table not in unknown]
+
+        if exclusive:
+            listed = set((change.repository, change.kind, change.name) for change in desired)
+            desired.extend(
+                PermissionChange(repository, kind, name, None)
+                for (repository, kind) in tables
+                for name in index.names(repository, kind)
+                if (repository, kind, name) not in listed
+                # Never revoke humans' permissions wholesale (e.g. the repository's creator's):
+                and (kind == "team" or "+" in name))
+
+        changes = list(index.diff(desired))
+        if self.check_mode:
+            for change in changes:
+                self.changed(self._describe(change), diff=self._permission_diff(index, change))
+            return
+
+        request = self.quay_request
+        executor = self.quay_executor()
+        for change in changes:
+            url = self._permission_url(change)
+            if change.role is None:
+                executor.submit(change, request.delete, url)
+            else:
+                executor.submit(change, request.put, url, dict(role=change.role))
+
+        outcomes = executor.run()
+        snapshot = self.quay_state_snapshot
+        for change in changes:
+            outcome = outcomes[change]
+            if outcome.error is not None:
+                self.failed(self._describe(change), outcome.error, item=self._item(change))
+                continue
+            self.changed(self._describe(change))
+            self.succeeded(self._item(change))
+            if snapshot is not None and change.kind == "user":
+                # Whatever `robot_account_permission` recorded about it is moot now:
+                snapshot.forget(permission_snapshot_key(
+                    self.quay_hostname, self.organization, change.repository, change.name))
+        if snapshot is not None:
+            snapshot.save()
+
+    def desired_permissions (self):
+        """The list of `PermissionChange`s that the `permissions` argument asks for."""
+        desired = []
+        for permission in self.args["permissions"]:
+            if "team" in permission:
+                kind, name = "team", permission["team"]
+            elif "robot" in permission:
+                kind, name = "user", permission["robot"]
+                if "+" not in name:
+                    name = f"{self.organization}+{name}"
+            else:
+                kind, name = "user", permission["user"]
+            desired.append(PermissionChange(
+                permission["repository"], kind, name,
+                None if permission.get("state", "present") == "absent"
+                else permission.get("permission", "read")))
+        return desired
+
+    def get_permission_index (self, tables):
+        """Read each of the `(repository, kind)` permission `tables` once, concurrently.
+
+        Returns a `(index, unknown)` tuple, where `unknown` maps the
+        tables that could not be read to the corresponding error.
+        """
+        request = self.quay_request
+        executor = self.quay_executor()
+        for (repository, kind) in tables:
+            # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepoteampermissions
+            # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepouserpermissions
+            executor.submit((repository, kind), lambda url: list(request.paginate(url, "permissions")),
+                            f"/api/v1/repository/{self.organization}/{repository}/permissions/{kind}/")
+
+        index = PermissionIndex()
+        unknown = {}
+        for table, outcome in executor.run().items():
+            if outcome.error is not None:
+                unknown[table] = outcome.error
+            else:
+                index.add_repository_permissions(*table, outcome.value)
+        return (index, unknown)
+
+    @staticmethod
+    def _item (change):
+        """How a permission is referred to in `failures`, `succeeded` and `retry_failed`."""
+        return f"{change.repository}/{change.kind}/{change.name}"
+
+    def _permission_url (self, change):
+        return (f"/api/v1/repository/{self.organization}/{change.repository}"
+                f"/permissions/{change.kind}/{change.name}")
+
+    @staticmethod
+    def _describe (change):
+        if change.role is None:
+            return f"Deleted {change.kind} permission of {change.name} on {change.repository}"
+        else:
+            return f"Set {change.role} {change.kind} permission for {change.name} on {change.repository}"
+
+    @staticmethod
+    def _permission_diff (index, change):
+        return (dict(repository=change.repository, kind=change.kind, name=change.name,
+                     role=index.get(change.repository, change.kind, change.name)),
+                dict(repository=change.repository, kind=change.kind, name=change.name,
+                     role=change.role))
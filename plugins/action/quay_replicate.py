@@ -0,0 +1,234 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, returns_none_on_404
+from ansible_collections.epfl_si.quay.plugins.module_utils.mirror_rules import TAG_RULE_KINDS
+from ansible_collections.epfl_si.quay.plugins.module_utils.repositories import QuayRepository
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Replicate the configuration of an organization from one Quay server to others.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_replicate.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_changes()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}"
+
+    def perform_changes (self):
+        if not self.check_unique(self.args["targets"], "targets",
+                                 key=lambda target: (target["hostname"],
+                                                     target.get("organization", self.organization))):
+            return
+
+        source = self.read_source()
+        if "failed" in self.result:
+            return
+
+        # Worker threads must not call into Ansible's templating engine:
+        targets = [_Target(self.quay_request_to(target["hostname"], target["bearer_token"]),
+                           target["hostname"],
+                           target.get("organization", self.organization),
+                           source_organization=self.organization,
+                           check_mode=self.check_mode,
+                           max_in_flight=self.quay_max_in_flight)
+                   for target in self.args["targets"]]
+
+        prune = self.args.get("prune", False)
+        executor = self.quay_executor()
+        for target in targets:
+            executor.submit(target.moniker, target.replicate, source, prune)
+        outcomes = executor.run()
+        for target in targets:
+            outcome = outcomes[target.moniker]
+            if outcome.error is not None:
+                target.failed("replicate", outcome.error)
+            self.merge_result(target.result, item=target.hostname)
+
+    def read_source (self):
+        """Read the organization's configuration from the source Quay server, once.
+
+        Returns a dict with keys `repositories` (a list of dicts with
+        the same structure as the `epfl_si.quay.quay_repository` task
+        arguments) and `robots` (a dict of robot descriptions, keyed
+        by short name), either of which may be None if not replicated.
+        """
+        what = self.args.get("replicate", ["repositories", "mirrors", "robots"])
+        source = dict(repositories=None, robots=None)
+
+        request = self.quay_request
+        if "robots" in what:
+            # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#getorgrobots
+            source["robots"] = {
+                robot["name"].split("+", 1)[1]: robot.get("description") or ""
+                for robot in request.paginate(
+                        f"/api/v1/organization/{self.organization}/robots", "robots",
+                        params=dict(token="false"))}
+
+        if "repositories" not in what:
+            return source
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepos
+        repositories = list(request.paginate(
+            "/api/v1/repository", "repositories",
+            params=dict(namespace=self.organization)))
+
+        mirrors = {}
+        if "mirrors" in what:
+            # Recent Quays tell mirrored repositories apart in the listing:
+            mirrored = [r["name"] for r in repositories
+                        if r.get("state", "MIRROR") == "MIRROR"]
+            get_mirror = returns_none_on_404(
+                lambda name: request.get(f"/api/v1/repository/{self.organization}/{name}/mirror").json())
+            executor = self.quay_executor()
+            for name in mirrored:
+                executor.submit(name, get_mirror, name)
+            for name, outcome in executor.run().items():
+                if outcome.error is not None:
+                    self.failed(f"GET mirror of {name}", outcome.error, item=name)
+                elif outcome.value is not None and outcome.value.get("is_enabled"):
+                    mirrors[name] = outcome.value
+
+        source["repositories"] = [
+            dict(name=r["name"],
+                 description=r.get("description") or "",
+                 visibility="public" if r["is_public"] else "private",
+                 mirror=mirrors.get(r["name"]))
+            for r in repositories]
+        return source
+
+
+class _Target (QuayActionMixin):
+    """One target Quay server, that `replicate` runs against from a worker thread."""
+    def __init__ (self, quay_request, hostname, organization, source_organization,
+                  check_mode, max_in_flight):
+        self._quay_request = quay_request
+        self.hostname = hostname
+        self.organization = organization
+        self.source_organization = source_organization
+        self._check_mode = check_mode
+        self._max_in_flight = max_in_flight
+        self.result = AnsibleResults.empty()
+
+    @property
+    def quay_hostname (self):
+        return self.hostname
+
+    @property
+    def quay_request (self):
+        return self._quay_request
+
+    @property
+    def check_mode (self):
+        return self._check_mode
+
+    @property
+    def quay_max_in_flight (self):
+        return self._max_in_flight
+
+    @property
+    def moniker (self):
+        return f"{self.hostname}/{self.organization}"
+
+    @property
+    def robots_url (self):
+        return f"/api/v1/organization/{self.organization}/robots"
+
+    def replicate (self, source, prune):
+        # Robots first, since mirrors need theirs to exist:
+        if source["robots"] is not None:
+            self.replicate_robots(source["robots"], prune)
+        if source["repositories"] is not None:
+            self.replicate_repositories(source["repositories"], prune)
+
+    def replicate_robots (self, robots, prune):
+        current = set(robot["name"].split("+", 1)[1]
+                      for robot in self.quay_request.paginate(
+                              self.robots_url, "robots", params=dict(token="false")))
+        to_create = [short for short in robots if short not in current]
+        to_delete = [short for short in sorted(current) if short not in robots] if prune else []
+
+        if self.check_mode:
+            for short in to_create:
+                self.changed(f"Created robot {short}", diff=({}, dict(name=short)))
+            for short in to_delete:
+                self.changed(f"Deleted robot {short}", diff=(dict(name=short), {}))
+            return
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#creating-robot-account-api
+        request = self.quay_request
+        executor = self.quay_executor()
+        for short in to_create:
+            executor.submit(("create", short), request.put, f"{self.robots_url}/{short}",
+                            dict(description=robots[short]) if robots[short] else None)
+        for short in to_delete:
+            executor.submit(("delete", short), request.delete, f"{self.robots_url}/{short}")
+
+        for (action, short), outcome in executor.run().items():
+            verb = "Created" if action == "create" else "Deleted"
+            if outcome.error is not None:
+                self.failed(f"{verb} robot {short}", outcome.error)
+            else:
+                self.changed(f"{verb} robot {short}")
+
+    def replicate_repositories (self, repositories, prune):
+        shared = dict(
+            quay_hostname=self.hostname,
+            quay_request=self.quay_request,
+            check_mode=self.check_mode,
+            quay_state_snapshot=None)
+
+        current = {r["name"]: r for r in self.quay_request.paginate(
+            "/api/v1/repository", "repositories",
+            params=dict(namespace=self.organization))}
+
+        desired = [QuayRepository(shared, self.organization, dict(
+            r, mirror=self.mirror_args(r["mirror"])))
+                   for r in repositories]
+        if prune:
+            names = set(r["name"] for r in repositories)
+            desired.extend(QuayRepository(shared, self.organization, dict(name=name, state="absent"))
+                           for name in current if name not in names)
+        stale = [r for r in desired if r.needs_reconciling(current.get(r.name))]
+
+        executor = self.quay_executor()
+        for repository in stale:
+            executor.submit(repository.name, repository.reconcile,
+                            repository.state, current.get(repository.name))
+        outcomes = executor.run()
+        for repository in stale:
+            outcome = outcomes[repository.name]
+            if outcome.error is not None:
+                repository.failed("reconcile", outcome.error)
+            self.merge_result(repository.result)
+
+    def mirror_args (self, mirror):
+        """Translate a mirror configuration read from the source Quay into `mirror` task arguments."""
+        if mirror is None:
+            return None
+        robot = mirror["robot_username"]
+        if robot.startswith(f"{self.source_organization}+"):
+            robot = f"{self.organization}+{robot.split('+', 1)[1]}"
+        rule = mirror["root_rule"]
+        return {
+            "from": mirror["external_reference"],
+            "robot_account": robot,
+            "rule_kind": rule["rule_kind"],
+            ("tags" if rule["rule_kind"] in TAG_RULE_KINDS else "rule_value"): rule["rule_value"],
+            "sync_interval": mirror.get("sync_interval"),
+            "timeout_seconds": mirror.get("skopeo_timeout_interval", 600),
+        }
@@ -0,0 +1,101 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.repositories import QuayRepository
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Reconcile all the repositories of a Quay organization at once.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_repositories.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_changes()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}"
+
+    def perform_changes (self):
+        if not self.check_unique(self.args["repositories"], "repository names",
+                                 key=lambda desired: desired["name"]):
+            return
+
+        # Worker threads must not call into Ansible's templating engine:
+        shared = dict(
+            quay_hostname=self.quay_hostname,
+            quay_request=self.quay_request,
+            check_mode=self.check_mode,
+            quay_state_snapshot=self.quay_state_snapshot)
+
+        candidates = [QuayRepository(shared, self.organization, desired)
+                      for desired in self.only_retrying(self.args["repositories"],
+                                                        key=lambda desired: desired["name"])]
+        # Pruning needs the complete list of desired repositories:
+        prune = self.args.get("prune", False) and self.items_to_retry is None
+        stale, known = [], []
+        for repository in candidates:
+            (known if repository.is_known_current(repository.state) else stale).append(repository)
+        if not (stale or prune):
+            return   # Everything is as per the state snapshot; nothing to read
+
+        current = self.get_repositories()
+        # What we just read trumps the state snapshot:
+        stale.extend(r for r in known if r.is_snapshot_contradicted(current.get(r.name)))
+        repositories = list(self.plan(shared, candidates, stale, current, prune))
+
+        executor = self.quay_executor()
+        for repository in repositories:
+            executor.submit(repository.name, repository.reconcile,
+                            repository.state, current.get(repository.name))
+        outcomes = executor.run()
+        for repository in repositories:
+            outcome = outcomes[repository.name]
+            if outcome.error is not None:
+                repository.failed("reconcile", outcome.error)
+            self.merge_result(repository.result, item=repository.name)
+
+        for repository in stale:
+            repository.remember(repository.state)
+        if shared["quay_state_snapshot"] is not None and not self.check_mode:
+            shared["quay_state_snapshot"].save()
+
+    def plan (self, shared, candidates, stale, current, prune):
+        """Yield one `QuayRepository` object per repository that (may) need changes.
+
+        Repositories whose description and visibility already match,
+        and that don't have a `mirror` configuration to check, are
+        skipped without any further API call; so are repositories
+        that the state snapshot (if any) says are up to date.
+        """
+        for repository in stale:
+            if repository.needs_reconciling(current.get(repository.name)):
+                yield repository
+
+        if prune:
+            desired_names = set(r.name for r in candidates)
+            for name in current:
+                if name not in desired_names:
+                    yield QuayRepository(shared, self.organization,
+                                      dict(name=name, state="absent"))
+
+    def get_repositories (self):
+        """Returns a dict of all the repositories in the organization, keyed by name."""
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepos
+        return {repository["name"]: repository
+                for repository in self.quay_request.paginate(
+                        "/api/v1/repository", "repositories",
+                        params=dict(namespace=self.organization))}
+
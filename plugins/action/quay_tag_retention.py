@@ -0,0 +1,89 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.tag_retention import RetentionPolicy
+from ansible_collections.epfl_si.quay.plugins.module_utils.throttling import TokenBucket
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Delete the tags of a repository that fall outside of a retention policy.
+
+    See operation details and Ansible-level documentation in
+    ../modules/quay_tag_retention.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+        self.name = args['repository']
+
+        self.result = AnsibleResults.empty()
+        try:
+            policy = RetentionPolicy(keep_last=args.get("keep_last"),
+                                     keep_days=args.get("keep_days"),
+                                     protect=args.get("protect", []))
+        except ValueError as e:
+            self.failed("retention policy", e)
+            return self.result
+
+        self.perform_changes(policy)
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}/{self.name}"
+
+    @property
+    def api_v1_tag_url (self):
+        return f"/api/v1/repository/{self.organization}/{self.name}/tag/"
+
+    def perform_changes (self, policy):
+        # Deleting tags while paging through them would shift the pages
+        # under our feet; so only the names of the expired tags are
+        # kept until the listing is complete.
+        expired = [tag["name"] for tag in policy.expired(self.get_tags())]
+        self.result["expired"] = expired
+        if not expired:
+            return
+
+        if self.check_mode:
+            self.changed(f"deleted {len(expired)} tag(s)",
+                         diff=(dict(tags=expired), dict(tags=[])))
+            return
+
+        from ansible_collections.epfl_si.quay.plugins.module_utils.quay_async import run_async
+
+        limiter = TokenBucket(self.args.get("delete_rate", 0))
+
+        async def delete (quay, name):
+            await limiter.acquire_async()
+            # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#deletefulltag
+            await quay.delete(f"{self.api_v1_tag_url}{name}")
+
+        async def delete_all ():
+            async with self.quay_async_client() as quay:
+                return await quay.gather(delete(quay, name) for name in expired)
+
+        deleted = []
+        # Tag names are unique, so that outcomes can be matched by position:
+        for name, error in zip(expired, run_async(delete_all())):
+            if error is not None:
+                self.failed(f"DELETE {self.api_v1_tag_url}{name}", error, item=name)
+            else:
+                deleted.append(name)
+        if deleted:
+            self.changed(f"deleted {len(deleted)} tag(s)")
+        self.result["deleted"] = deleted
+
+    def get_tags (self):
+        """Stream the active tags of the repository, newest first."""
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#listrepotags
+        return self.quay_request.paginate(
+            self.api_v1_tag_url, "tags",
+            params=dict(onlyActiveTags="true", limit=100),
+            prefetch=True)
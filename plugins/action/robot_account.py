@@ -1,13 +1,9 @@
-import datetime
-
-import requests
-
 from ansible.plugins.action import ActionBase
-from ansible.parsing.yaml.objects import AnsibleUnicode
 
 from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
 from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
 from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, returns_none_on_404
+from ansible_collections.epfl_si.quay.plugins.module_utils.robot_accounts import RobotListingCache
 
 class ActionModule (ActionBase, QuayActionMixin):
     """Set up or delete a robot account.
@@ -26,6 +22,7 @@ class ActionModule (ActionBase, QuayActionMixin):
 
         self.result = AnsibleResults.empty()
         self.perform_changes(args.get('state', 'present'))
+        self.report_metrics()
         return self.result
 
     @property
@@ -49,9 +46,10 @@ class ActionModule (ActionBase, QuayActionMixin):
     @returns_none_on_404
     def get (self):
         # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#robot-account-permissions-api
+        from requests.exceptions import HTTPError
         try:
             return self.quay_request.get(self.api_v1_url).json()
-        except requests.HTTPError as e:
+        except HTTPError as e:
             if (e.response.status_code == 400 and
                 e.response.json()["message"] == 'Could not find robot with specified username'):
                 return None
@@ -61,13 +59,23 @@ class ActionModule (ActionBase, QuayActionMixin):
         return self.args.get("permission", "read")
 
     def do_create (self):
+        if self.check_mode:
+            self.changed(f"Created {self.moniker}", diff=({}, dict(name=self.robot_account_name)))
+            return
+
         # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#creating-robot-account-api
         response = self.quay_request.put(
             self.api_v1_url)
-        self.changed(f"Created ${self.moniker}")
+        RobotListingCache.invalidate(self.quay_hostname, self.organization)
+        self.changed(f"Created {self.moniker}")
 
     def do_delete (self):
+        if self.check_mode:
+            self.changed(f"Deleted {self.moniker}", diff=(dict(name=self.robot_account_name), {}))
+            return
+
         # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#deleteuserpermissions
         response = self.quay_request.delete(
             self.api_v1_url)
-        self.changed(f"Deleted ${self.moniker}")
+        RobotListingCache.invalidate(self.quay_hostname, self.organization)
+        self.changed(f"Deleted {self.moniker}")
@@ -1,13 +1,9 @@
-import datetime
-
-import requests
-
 from ansible.plugins.action import ActionBase
-from ansible.parsing.yaml.objects import AnsibleUnicode
 
 from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
 from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
 from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, returns_none_on_404
+from ansible_collections.epfl_si.quay.plugins.module_utils.permissions import PermissionChange, PermissionIndex, permission_snapshot_key
 
 class ActionModule (ActionBase, QuayActionMixin):
     """Set up or delete a permission for a robot account.
@@ -22,38 +18,147 @@ class ActionModule (ActionBase, QuayActionMixin):
         self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
 
         self.organization = args['organization']
-        self.repository_name = args['repository_name']
+        self.repository_name = args.get('repository_name')
         self.robot_account_name = args['robot_account_name']
 
         self.result = AnsibleResults.empty()
-        self.perform_changes(args.get('state', 'present'))
+        if 'repositories' in args:
+            self.perform_bulk_changes(args.get('state', 'present'))
+        else:
+            self.perform_changes(args.get('state', 'present'))
+        self.report_metrics()
         return self.result
 
     @property
     def moniker (self):
-        return f"permissions of {self.robot_account_name} on {self.quay_hostname}/{self.organization}/{self.repository_name}"
+        if self.repository_name is None:
+            return f"permissions of {self.robot_account_name} on {self.quay_hostname}/{self.organization}"
+        return permission_snapshot_key(self.quay_hostname, self.organization,
+                                       self.repository_name, self.robot_account_name)
 
     @property
     def api_v1_url (self):
         return f"/api/v1/repository/{self.organization}/{self.repository_name}/permissions/user/{self.robot_account_name}"
 
     def perform_changes (self, state):
+        snapshot = self.quay_state_snapshot
+        desired_hash = (snapshot.desired_hash(dict(state=state, permission=self.desired_permission))
+                        if snapshot is not None else None)
+        if snapshot is not None and snapshot.is_current(self.moniker, desired_hash):
+            return
+
+        self._perform_changes(state)
+
+        if snapshot is not None and not self.check_mode and not self.result.get("failed"):
+            snapshot.record(self.moniker, desired_hash,
+                            dict(role=None if state == "absent" else self.desired_permission))
+            snapshot.save()
+
+    def _perform_changes (self, state):
         exists = self.get_permissions()
 
         if state == "absent":
             if exists:
-                self.do_delete()
+                self.do_delete(exists)
         else:
            if not exists:
-                self.do_update()
+                self.do_update(exists)
            elif exists["role"] != self.desired_permission:
-                self.do_update()
+                self.do_update(exists)
+
+    def perform_bulk_changes (self, state):
+        desired = self.desired_bulk_permissions(state)
+        if not self.check_unique(desired, "repositories", key=lambda change: change.repository):
+            return
+
+        index = self.get_permission_index()
+
+        desired = self.only_retrying(desired, key=lambda change: change.repository)
+        # Revoking unlisted permissions needs the complete list:
+        if self.args.get("exclusive", False) and self.items_to_retry is None:
+            listed = set(change.repository for change in desired)
+            desired.extend(
+                PermissionChange(repository, "user", self.robot_account_name, None)
+                for repository in index.holders("user", self.robot_account_name)
+                if repository not in listed)
+
+        changes = list(index.diff(desired))
+        if self.check_mode:
+            for change in changes:
+                self.changed(
+                    f"Deleted permission on {change.repository}" if change.role is None
+                    else f"Set {change.role} permission on {change.repository}",
+                    diff=self._permission_diff(index, change))
+            return
+
+        request = self.quay_request
+        executor = self.quay_executor()
+        for change in changes:
+            url = self._repository_permission_url(change.repository)
+            if change.role is None:
+                executor.submit(change.repository, request.delete, url)
+            else:
+                executor.submit(change.repository, request.put, url, dict(role=change.role))
+
+        outcomes = executor.run()
+        snapshot = self.quay_state_snapshot
+        for change in changes:
+            outcome = outcomes[change.repository]
+            if outcome.error is not None:
+                self.failed(f"{change.repository}", outcome.error, item=change.repository)
+                continue
+            elif change.role is None:
+                self.changed(f"Deleted permission on {change.repository}")
+            else:
+                self.changed(f"Set {change.role} permission on {change.repository}")
+            self.succeeded(change.repository)
+            if snapshot is not None:
+                # What single-repository tasks recorded is moot now:
+                snapshot.forget(permission_snapshot_key(
+                    self.quay_hostname, self.organization, change.repository, change.name))
+        if snapshot is not None:
+            snapshot.save()
+
+    def desired_bulk_permissions (self, state):
+        """The list of `PermissionChange`s that the `repositories` argument asks for."""
+        desired = []
+        for repository in self.args["repositories"]:
+            if isinstance(repository, dict):
+                name = repository["name"]
+                role = repository.get("permission", self.desired_permission)
+                repository_state = repository.get("state", state)
+            else:
+                name, role, repository_state = repository, self.desired_permission, state
+            desired.append(PermissionChange(
+                name, "user", self.robot_account_name,
+                None if repository_state == "absent" else role))
+        return desired
+
+    def get_permission_index (self):
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#getuserpermissions
+        shortname = self.robot_account_name.split("+", 1)[-1]
+        index = PermissionIndex()
+        index.add_robot_permissions(
+            self.robot_account_name,
+            self.quay_request.paginate(
+                f"/api/v1/organization/{self.organization}/robots/{shortname}/permissions",
+                "permissions"))
+        return index
+
+    def _permission_diff (self, index, change):
+        return (dict(repository=change.repository,
+                     role=index.get(change.repository, change.kind, change.name)),
+                dict(repository=change.repository, role=change.role))
+
+    def _repository_permission_url (self, repository_name):
+        return f"/api/v1/repository/{self.organization}/{repository_name}/permissions/user/{self.robot_account_name}"
 
     @returns_none_on_404
     def get_permissions (self):
+        from requests.exceptions import HTTPError
         try:
-            return self.quay_request.get(self.api_v1_url).json()
-        except requests.HTTPError as e:
+            return self.quay_request.get_cached(self.api_v1_url).json()
+        except HTTPError as e:
             if (e.response.status_code == 400 and
                 e.response.json()["message"] == 'User does not have permission for repo.'):
                 return None
@@ -62,14 +167,25 @@ class ActionModule (ActionBase, QuayActionMixin):
     def desired_permission (self):
         return self.args.get("permission", "read")
 
-    def do_update (self):
+    def do_update (self, exists=None):
+        if self.check_mode:
+            self.changed(f"Set {self.desired_permission} permission", diff=(
+                dict(role=exists["role"] if exists else None),
+                dict(role=self.desired_permission)))
+            return
+
         # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#changeuserpermissions
         response = self.quay_request.put(
             self.api_v1_url,
             dict(role=self.desired_permission))
         self.changed(f"Set {self.desired_permission} permission")
 
-    def do_delete (self):
+    def do_delete (self, exists=None):
+        if self.check_mode:
+            self.changed(f"Deleted {self.desired_permission} permission", diff=(
+                dict(role=exists["role"] if exists else None), dict(role=None)))
+            return
+
         # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#deleteuserpermissions
         response = self.quay_request.delete(
             self.api_v1_url)
@@ -0,0 +1,139 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.subactions import AnsibleActions
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.robot_accounts import RobotListingCache
+
+class ActionModule (ActionBase, QuayActionMixin):
+    """Set up or delete many robot accounts of one organization at once.
+
+    See operation details and Ansible-level documentation in
+    ../modules/robot_accounts.py which only exists for documentation
+    purposes.
+    """
+    @AnsibleActions.run_method
+    def run (self, args, ansible_api):
+        self.args = args
+        self.ansible = ansible_api  # For the mixin's `quay_hostname` and `quay_bearer_token`
+
+        self.organization = args['organization']
+
+        self.result = AnsibleResults.empty()
+        self.perform_changes()
+        self.report_metrics()
+        return self.result
+
+    @property
+    def moniker (self):
+        return f"robot accounts of {self.quay_hostname}/{self.organization}"
+
+    @property
+    def api_v1_url (self):
+        return f"/api/v1/organization/{self.organization}/robots"
+
+    def fullname (self, short_name):
+        return f"{self.organization}+{short_name}"
+
+    def perform_changes (self):
+        desired = self.desired_robots()
+        if not self.check_unique(desired, "robot accounts", key=lambda d: d["short_name"]):
+            return
+        current = self.get_robots()
+
+        to_process = self.only_retrying(desired, key=lambda d: d["short_name"])
+        to_create = [d for d in to_process
+                     if d["state"] != "absent" and self.fullname(d["short_name"]) not in current]
+        to_delete = [d["short_name"] for d in to_process
+                     if d["state"] == "absent" and self.fullname(d["short_name"]) in current]
+        # Pruning needs the complete list of desired robots:
+        if self.args.get("prune", False) and self.items_to_retry is None:
+            listed = set(self.fullname(d["short_name"]) for d in desired)
+            to_delete.extend(name.split("+", 1)[1] for name in current
+                             if name not in listed)
+
+        created = self.do_create(to_create)
+        self.do_delete(to_delete)
+
+        if to_create or to_delete:
+            RobotListingCache.invalidate(self.quay_hostname, self.organization)
+
+        # Return credentials for all present robots, so that playbooks don't
+        # need to look them up again (e.g. for
+        # ../filter/format_docker_config_json.py):
+        robots = []
+        for d in desired:
+            if d["state"] == "absent":
+                continue
+            fullname = self.fullname(d["short_name"])
+            robot = created.get(fullname, current.get(fullname))
+            if robot is not None:
+                robots.append(dict(name=robot["name"], token=robot.get("token"),
+                                   quay_hostname=self.quay_hostname))
+        self.result["robots"] = robots
+
+    def desired_robots (self):
+        desired = []
+        for robot in self.args["robots"]:
+            if not isinstance(robot, dict):
+                robot = dict(short_name=robot)
+            desired.append(dict(robot, state=robot.get("state", self.args.get("state", "present"))))
+        return desired
+
+    def get_robots (self):
+        """Returns a dict of all the organization's robots (with their tokens), keyed by full name."""
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#getorgrobots
+        return {robot["name"]: robot
+                for robot in self.quay_request.paginate(
+                        self.api_v1_url, "robots", params=dict(token="true"))}
+
+    def do_create (self, to_create):
+        """Create the robots in `to_create`, and return them (with their tokens) keyed by full name."""
+        if self.check_mode:
+            for d in to_create:
+                self.changed(f"Created {self.fullname(d['short_name'])}",
+                             diff=({}, dict(name=self.fullname(d["short_name"]))))
+            return {}
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#creating-robot-account-api
+        request = self.quay_request
+        executor = self.quay_executor()
+        for d in to_create:
+            body = dict(description=d["description"]) if "description" in d else None
+            executor.submit(d["short_name"], request.put,
+                            f"{self.api_v1_url}/{d['short_name']}", body)
+
+        created = {}
+        outcomes = executor.run()
+        for d in to_create:
+            outcome = outcomes[d["short_name"]]
+            fullname = self.fullname(d["short_name"])
+            if outcome.error is not None:
+                self.failed(f"Create {fullname}", outcome.error, item=d["short_name"])
+            else:
+                created[fullname] = outcome.value.json()
+                self.changed(f"Created {fullname}")
+                self.succeeded(d["short_name"])
+        return created
+
+    def do_delete (self, to_delete):
+        if self.check_mode:
+            for short_name in to_delete:
+                self.changed(f"Deleted {self.fullname(short_name)}",
+                             diff=(dict(name=self.fullname(short_name)), {}))
+            return
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#deleteorgrobot
+        request = self.quay_request
+        executor = self.quay_executor()
+        for short_name in to_delete:
+            executor.submit(short_name, request.delete, f"{self.api_v1_url}/{short_name}")
+
+        outcomes = executor.run()
+        for short_name in to_delete:
+            outcome = outcomes[short_name]
+            if outcome.error is not None:
+                self.failed(f"Delete {self.fullname(short_name)}", outcome.error, item=short_name)
+            else:
+                self.changed(f"Deleted {self.fullname(short_name)}")
+                self.succeeded(short_name)
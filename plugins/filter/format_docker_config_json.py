@@ -1,4 +1,8 @@
 import base64
+import functools
+import json
+
+from ansible.errors import AnsibleFilterError
 
 DOCUMENTATION = '''
 module: format_docker_config_json
@@ -22,6 +26,21 @@ description:
 - C(token)
 - The robot account's bearer token, as can be seen in the Quay UI
 
+- >-
+  The input may also be a list of such dicts (e.g. as returned by
+  the C(epfl_si.quay.robot_account) lookup plugin with several robot
+  names, or in the C(robots) result of the C(epfl_si.quay.robot_accounts)
+  task), possibly pertaining to several Quay servers. In that case,
+  the filter returns a single C(.dockerconfigjson) with credentials
+  for all of them. An empty list is an error.
+
+- >-
+  Each dict may also have a C(registry) field, which overrides
+  C(quay_hostname) as the key in the C(auths) section; this is useful
+  to provide different credentials for different organizations on the
+  same Quay server (e.g. C(quay.io/myorg)). It is an error to pass
+  different credentials for the same key.
+
 version_added: 0.4.0
 '''
 
@@ -45,6 +64,23 @@ EXAMPLES = '''
   vars:
     _my_token: ...
 
+- name: "`Secret/my-pullers`"
+  kubernetes.core.k8s:
+    state: present
+    definition:
+      apiVersion: v1
+      kind: Secret
+      metadata:
+        name: my-pullers
+        namespace: my-namespace
+      type: kubernetes.io/dockerconfigjson
+      stringData:
+        .dockerconfigjson: >-
+          {{ (query("epfl_si.quay.robot_account", "myorg", "myorg+puller")
+              + query("epfl_si.quay.robot_account", "otherorg", "otherorg+puller",
+                      hostname="quay.example.com", token=_other_token))
+          | epfl_si.quay.format_docker_config_json | string }}
+
 '''
 
 class FilterModule(object):
@@ -53,17 +89,29 @@ class FilterModule(object):
             'format_docker_config_json': self.format_docker_config_json
         }
 
-    def format_docker_config_json (self, robot_account_struct):
-        basic_auth = base64.b64encode(f'{robot_account_struct["name"]}:{robot_account_struct["token"]}'.encode()).decode("ascii")
-        quay_hostname = robot_account_struct["quay_hostname"]
-
-        return """{
-  "auths": {
-    "%(quay_hostname)s": {
-      "auth": "%(basic_auth)s",
-      "email": ""
-    }
-  }
-}""" % dict(
-          quay_hostname=quay_hostname,
-          basic_auth=basic_auth)
+    def format_docker_config_json (self, robot_account_structs):
+        if isinstance(robot_account_structs, dict):
+            robot_account_structs = [robot_account_structs]
+        elif not (isinstance(robot_account_structs, list) and robot_account_structs
+                  and all(isinstance(s, dict) for s in robot_account_structs)):
+            raise AnsibleFilterError(
+                "format_docker_config_json: expected a robot account (dict), "
+                f"or a non-empty list thereof; got {type(robot_account_structs).__name__}")
+
+        auths = {}
+        for robot_account_struct in robot_account_structs:
+            registry = robot_account_struct.get("registry", robot_account_struct["quay_hostname"])
+            auth = dict(
+                auth=_basic_auth(robot_account_struct["name"], robot_account_struct["token"]),
+                email="")
+            if registry in auths and auths[registry] != auth:
+                raise AnsibleFilterError(
+                    f"format_docker_config_json: conflicting credentials for {registry}")
+            auths[registry] = auth
+
+        return json.dumps(dict(auths=auths), indent=2)
+
+
+@functools.lru_cache(maxsize=4096)
+def _basic_auth (username, token):
+    return base64.b64encode(f'{username}:{token}'.encode()).decode("ascii")
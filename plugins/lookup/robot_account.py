@@ -4,6 +4,27 @@ short_description: Retrieve the details (including OAuth token) of a robot accou
 description:
 - This lookup plugin fetches the details of a Quay robot account out of Quay's REST API.
 
+- The first term is the organization; all subsequent terms are robot
+  account names. The robot accounts are returned in the same order as
+  the terms; the lookup fails if any of them doesn't exist.
+
+- The list of the organization's robot accounts is fetched only once,
+  and cached in-process for C(cache_ttl) seconds, so that looking up
+  many robots of the same organization (in one or several lookups of
+  the same task) costs a single API call.
+
+options:
+  hostname:
+    description: The Quay server to query (defaults to C(ansible_quay_hostname))
+  token:
+    description: The bearer token to query Quay with (defaults to C(ansible_quay_bearer_token))
+  cache_ttl:
+    description: How long (in seconds) to keep the organization's robot listing in cache
+    default: 60
+  refresh:
+    description: Set to true to ignore (and replace) the cached robot listing
+    default: false
+
 version_added: 0.3.0
 '''
 
@@ -27,29 +48,62 @@ EXAMPLES = '''
   vars:
     _my_token: ...
 
-'''
+- name: Several robots at once
+  ansible.builtin.debug:
+    msg: >-
+      {{ query("epfl_si.quay.robot_account", my_organization, "myorg+puller", "myorg+pusher") }}
 
-import requests
+'''
 
+from ansible.errors import AnsibleLookupError
 from ansible.plugins.lookup import LookupBase
-from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, QuaySessionPool
+from ansible_collections.epfl_si.quay.plugins.module_utils.robot_accounts import RobotListingCache
+from ansible_collections.epfl_si.quay.plugins.module_utils.throttling import RateLimiters, RetryPolicy
 
 class LookupModule (LookupBase):
-    def run (self, terms, variables=None, hostname=None, token=None):
-        [organization, robot_account_name] = terms
+    def run (self, terms, variables=None, hostname=None, token=None,
+             cache_ttl=60, refresh=False):
+        [organization, *robot_account_names] = terms
+        variables = variables or {}
         if token is None:
             token = variables["ansible_quay_bearer_token"]
 
         if hostname is None:
             hostname = variables["ansible_quay_hostname"]
 
-        response = requests.get(
-            f"https://{hostname}/api/v1/organization/{organization}/robots",
-            headers=dict(Authorization=f"bearer {token}"))
-        response.raise_for_status()
-        
-        ret = [robot for robot in response.json()["robots"]
-                if robot["name"] == robot_account_name]
+        def fetch ():
+            session = QuaySessionPool.get(
+                hostname, token,
+                maxsize=int(variables.get("ansible_quay_pool_maxsize", 10)),
+                idle_timeout=float(variables.get("ansible_quay_pool_idle_timeout", 300)))
+            retry_policy = RetryPolicy(
+                retries=int(variables.get("ansible_quay_retries", 5)),
+                backoff=float(variables.get("ansible_quay_retry_backoff", 0.5)),
+                max_backoff=float(variables.get("ansible_quay_retry_max_backoff", 30)))
+            limiter = RateLimiters.get(
+                hostname,
+                rate=float(variables.get("ansible_quay_rate_limit", 0)),
+                burst=float(variables.get("ansible_quay_rate_burst") or 0) or None)
+            response = retry_policy.send(
+                "GET",
+                lambda: session.get(
+                    f"https://{hostname}/api/v1/organization/{organization}/robots"),
+                limiter)
+            response.raise_for_status()
+            return response.json()["robots"]
+
+        if refresh:
+            RobotListingCache.invalidate(hostname, organization)
+        robots = RobotListingCache.get(hostname, token, organization, fetch,
+                                       ttl=float(cache_ttl))
+        robots_by_name = {robot["name"]: robot for robot in robots}
+
+        unknown = [name for name in robot_account_names if name not in robots_by_name]
+        if unknown:
+            raise AnsibleLookupError(
+                f"No such robot account(s) in {hostname}/{organization}: {', '.join(unknown)}")
+        ret = [robots_by_name[name] for name in robot_account_names]
 
         # For the benefit of ../filter/format_docker_config_json.py (or for any other purpose):
         for robot in ret:
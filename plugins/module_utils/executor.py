@@ -0,0 +1,60 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+Outcome = namedtuple("Outcome", ["lane", "value", "error"])
+
+
+class QuayExecutor:
+    """Run independent Quay API calls concurrently.
+
+    Calls are grouped into *lanes*, identified by an arbitrary hashable
+    key (typically, the name of the resource they operate upon). Calls
+    in the same lane run one after the other, in the order they were
+    submitted, and a lane stops at its first exception — so that e.g.
+    a mirror is never configured on a repository that failed to be
+    created. Distinct lanes run concurrently, with at most
+    `max_in_flight` of them in progress at any given time.
+
+    This class is not meant to be reused; create one per batch of
+    calls.
+    """
+    def __init__ (self, max_in_flight=8):
+        self.max_in_flight = max(1, max_in_flight)
+        self._lanes = {}
+
+    def submit (self, lane, f, *args, **kwargs):
+        self._lanes.setdefault(lane, []).append((f, args, kwargs))
+
+    def run (self):
+        """Run all submitted calls and wait for them to complete.
+
+        Returns a dict of `Outcome` named tuples keyed by lane, in lane
+        submission order. `value` is the return value of the lane's
+        last call, and `error` the exception that stopped the lane (or
+        None if it ran to completion).
+
+        Since all calls submitted with the same lane share one
+        `Outcome`, callers that submit one call per item must look up
+        outcomes by lane, and make sure that their items (and hence
+        lanes) are distinct (see `QuayActionMixin.check_unique`).
+        """
+        lanes = list(self._lanes.items())
+        self._lanes = {}
+
+        if self.max_in_flight == 1 or len(lanes) <= 1:
+            return {lane: self._run_lane(lane, calls) for lane, calls in lanes}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(lanes))) as pool:
+            futures = [(lane, pool.submit(self._run_lane, lane, calls))
+                       for lane, calls in lanes]
+            return {lane: future.result() for lane, future in futures}
+
+    @staticmethod
+    def _run_lane (lane, calls):
+        value = None
+        for (f, args, kwargs) in calls:
+            try:
+                value = f(*args, **kwargs)
+            except Exception as e:
+                return Outcome(lane, value, e)
+        return Outcome(lane, value, None)
@@ -0,0 +1,169 @@
+import fcntl
+import json
+import os
+import re
+import threading
+
+
+class QuayMetrics:
+    """Per-endpoint statistics about Quay API calls.
+
+    Endpoints are folded into templates (e.g.
+    `/api/v1/repository/{namespace}/{repository}/mirror`), so that the
+    number of series stays bounded no matter how many repositories
+    a run touches. For each `(method, endpoint)` pair, we count calls,
+    errors (HTTP 4xx / 5xx and connection errors), retries, cache hits
+    and bytes transferred, and keep a latency histogram.
+
+    Instances are thread-safe.
+    """
+    buckets = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    _endpoint_templates = (
+        (re.compile(r"^/api/v1/repository/[^/]+/[^/]+"), "/api/v1/repository/{namespace}/{repository}"),
+        (re.compile(r"^/api/v1/organization/[^/]+"), "/api/v1/organization/{orgname}"),
+        (re.compile(r"/robots/[^/]+"), "/robots/{robot_shortname}"),
+        (re.compile(r"/permissions/(user|team)/[^/]+"), r"/permissions/\1/{name}"),
+        (re.compile(r"/tag/[^/]+"), "/tag/{tag}"),
+    )
+
+    def __init__ (self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def endpoint_template (cls, endpoint):
+        template = endpoint.split("?", 1)[0]
+        for (regexp, replacement) in cls._endpoint_templates:
+            template = regexp.sub(replacement, template)
+        return template
+
+    def record (self, method, endpoint, status_code, seconds,
+                bytes_sent=0, bytes_received=0, is_retry=False):
+        """Record one HTTP round-trip. `status_code` is None for connection errors."""
+        with self._lock:
+            series = self._get_series(method, endpoint)
+            series["calls"] += 1
+            if status_code is None or status_code >= 400:
+                series["errors"] += 1
+            if is_retry:
+                series["retries"] += 1
+            series["bytes_sent"] += bytes_sent
+            series["bytes_received"] += bytes_received
+            series["seconds_total"] += seconds
+            for le in self.buckets:
+                if seconds <= le:
+                    series["latency_buckets"][str(le)] += 1
+                    break
+            else:
+                series["latency_buckets"]["+Inf"] += 1
+
+    def record_cache_hit (self, method, endpoint):
+        with self._lock:
+            self._get_series(method, endpoint)["cache_hits"] += 1
+
+    def _get_series (self, method, endpoint):
+        key = f"{method} {self.endpoint_template(endpoint)}"
+        if key not in self._series:
+            self._series[key] = self._empty_series()
+        return self._series[key]
+
+    @classmethod
+    def _empty_series (cls):
+        return dict(
+            calls=0, errors=0, retries=0, cache_hits=0,
+            bytes_sent=0, bytes_received=0, seconds_total=0.0,
+            latency_buckets={ le: 0 for le in [str(b) for b in cls.buckets] + ["+Inf"] })
+
+    def snapshot (self):
+        """A JSON-serializable summary, suitable for an Ansible task result."""
+        with self._lock:
+            endpoints = json.loads(json.dumps(self._series))
+        for series in endpoints.values():
+            series["error_rate"] = series["errors"] / series["calls"] if series["calls"] else 0.0
+            series["seconds_mean"] = series["seconds_total"] / series["calls"] if series["calls"] else 0.0
+        return dict(endpoints=endpoints)
+
+    @classmethod
+    def merge (cls, into, snapshot):
+        """Add the counters of `snapshot` into `into` (both as returned by `snapshot()`)."""
+        endpoints = into.setdefault("endpoints", {})
+        for (key, series) in snapshot.get("endpoints", {}).items():
+            target = endpoints.setdefault(key, cls._empty_series())
+            for k in ("calls", "errors", "retries", "cache_hits",
+                      "bytes_sent", "bytes_received", "seconds_total"):
+                target[k] += series.get(k, 0)
+            for (le, count) in series.get("latency_buckets", {}).items():
+                target["latency_buckets"][le] = target["latency_buckets"].get(le, 0) + count
+            target["error_rate"] = target["errors"] / target["calls"] if target["calls"] else 0.0
+            target["seconds_mean"] = target["seconds_total"] / target["calls"] if target["calls"] else 0.0
+        return into
+
+    @classmethod
+    def to_prometheus (cls, snapshot):
+        """Render `snapshot` in the Prometheus text exposition format."""
+        counters = (
+            ("quay_api_requests_total", "calls", "Quay API calls, including retries"),
+            ("quay_api_request_errors_total", "errors", "Quay API calls that failed"),
+            ("quay_api_request_retries_total", "retries", "Quay API calls that were retries"),
+            ("quay_api_cache_hits_total", "cache_hits", "Quay API reads served from the response cache"),
+            ("quay_api_sent_bytes_total", "bytes_sent", "Bytes sent to Quay in request bodies"),
+            ("quay_api_received_bytes_total", "bytes_received", "Bytes received from Quay in response bodies"),
+        )
+        endpoints = sorted(snapshot.get("endpoints", {}).items())
+
+        def labels (key, **more):
+            (method, endpoint) = key.split(" ", 1)
+            pairs = dict(method=method, endpoint=endpoint, **more)
+            return ",".join(f'{k}="{v}"' for (k, v) in pairs.items())
+
+        lines = []
+        for (metric, field, help) in counters:
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} counter")
+            for (key, series) in endpoints:
+                lines.append(f"{metric}{{{labels(key)}}} {series[field]}")
+
+        metric = "quay_api_request_duration_seconds"
+        lines.append(f"# HELP {metric} Latency of Quay API calls")
+        lines.append(f"# TYPE {metric} histogram")
+        for (key, series) in endpoints:
+            cumulative = 0
+            for le in [str(b) for b in cls.buckets] + ["+Inf"]:
+                cumulative += series["latency_buckets"].get(le, 0)
+                lines.append(f"{metric}_bucket{{{labels(key, le=le)}}} {cumulative}")
+            lines.append(f"{metric}_sum{{{labels(key)}}} {series['seconds_total']}")
+            lines.append(f"{metric}_count{{{labels(key)}}} {series['calls']}")
+
+        return "\n".join(lines) + "\n"
+
+    def accumulate_into_file (self, path):
+        """Merge this instance's counters into the report at `path`.
+
+        Ansible runs each task in a short-lived process, so there is
+        no single place that sees the whole run; instead, every task
+        adds its own counters to the report, under an exclusive lock.
+        If `path` ends in `.prom`, the report is kept as JSON in a
+        `path + ".json"` sidecar, and `path` gets the Prometheus
+        rendering thereof.
+        """
+        json_path = path + ".json" if path.endswith(".prom") else path
+        with open(json_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                text = f.read()
+                report = json.loads(text) if text.strip() else {}
+                self.merge(report, self.snapshot())
+                f.seek(0)
+                f.truncate()
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.flush()
+
+                if json_path != path:
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp, "w") as prom:
+                        prom.write(self.to_prometheus(report))
+                    os.replace(tmp, path)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,89 @@
+"""Quay mirror rules (the `root_rule` of a repository's mirror configuration).
+
+Tag lists are handled as ordered sets: a tag that is already in the
+current rule keeps its place, so that a run that doesn't change the
+set of tags doesn't change the rule either (and therefore doesn't
+cause a PUT). All operations are linear in the number of tags.
+"""
+
+TAG_RULE_KINDS = ("tag_glob_csv",)
+
+TAGS_MODES = ("replace", "add", "remove")
+
+
+def canonical_tags (tags):
+    """Returns `tags` as a list of distinct, stripped tag globs, in order.
+
+    `tags` may be a list, or a single comma-separated string (as in
+    Quay's own “tag_glob_csv” user interface); list items may
+    themselves be comma-separated.
+    """
+    if tags is None:
+        return []
+    if isinstance(tags, str):
+        tags = [tags]
+    seen = {}
+    for item in tags:
+        for tag in str(item).split(","):
+            tag = tag.strip()
+            if tag:
+                seen.setdefault(tag, None)
+    return list(seen)
+
+
+def merge_tags (current, tags, mode="replace", remove=()):
+    """Compute the new tag list out of the `current` one.
+
+    `mode` is one of `TAGS_MODES`:
+
+    - `replace`: the result is `tags`, except that if it has the same
+      tags as `current`, `current` is returned as-is;
+    - `add`: `tags` are appended to `current`, unless already there;
+    - `remove`: `tags` are removed from `current`.
+
+    Whatever the mode, the tags in `remove` are taken out of the
+    result afterwards.
+    """
+    current = canonical_tags(current)
+    tags = canonical_tags(tags)
+    if mode == "replace":
+        result = current if set(current) == set(tags) else tags
+    elif mode == "add":
+        already = set(current)
+        result = current + [t for t in tags if t not in already]
+    elif mode == "remove":
+        removed = set(tags)
+        result = [t for t in current if t not in removed]
+    else:
+        raise ValueError(f"Unknown tags mode {mode!r}; should be one of {', '.join(TAGS_MODES)}")
+
+    if remove:
+        removed = set(canonical_tags(remove))
+        result = [t for t in result if t not in removed]
+    return result
+
+
+def desired_root_rule (mirror_desired, current_rule):
+    """The `root_rule` to send to Quay, given the `mirror` task argument.
+
+    `current_rule` is the `root_rule` of the current mirror
+    configuration, or None if there is none. The `tags_mode` and
+    `remove_tags` sub-options only make sense if the current rule is
+    of the same (tag-based) kind as the desired one; otherwise, the
+    desired rule replaces the current one outright.
+    """
+    rule_kind = mirror_desired.get("rule_kind", "tag_glob_csv")
+    if rule_kind not in TAG_RULE_KINDS:
+        return dict(rule_kind=rule_kind,
+                    rule_value=mirror_desired.get("rule_value", mirror_desired.get("tags")))
+
+    if current_rule is not None and current_rule.get("rule_kind") == rule_kind:
+        current_tags = current_rule.get("rule_value")
+    else:
+        current_tags = []
+    return dict(
+        rule_kind=rule_kind,
+        rule_value=merge_tags(current_tags,
+                              mirror_desired.get("tags"),
+                              mode=mirror_desired.get("tags_mode", "replace"),
+                              remove=mirror_desired.get("remove_tags", ())))
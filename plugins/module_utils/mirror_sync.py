@@ -0,0 +1,95 @@
+from collections import deque
+import time
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.executor import QuayExecutor
+
+
+class MirrorSyncOrchestrator:
+    """Trigger mirror synchronizations on many repositories, and wait for them.
+
+    At most `max_concurrent_syncs` synchronizations are in progress at
+    any given time, so as not to swamp Quay's mirroring workers; as
+    soon as one of them completes, the next repository in line gets
+    its turn. In-progress synchronizations are polled all at once
+    (with at most `max_in_flight` concurrent API calls), every
+    `poll_interval` seconds at first; the interval doubles, up to
+    `max_poll_interval`, for as long as no synchronization completes.
+    """
+    terminal_statuses = frozenset(("SUCCESS", "FAIL", "CANCEL"))
+
+    def __init__ (self, quay_request, organization,
+                  max_concurrent_syncs=5, timeout=3600,
+                  poll_interval=5, max_poll_interval=60, max_in_flight=8):
+        self.quay_request = quay_request
+        self.organization = organization
+        self.max_concurrent_syncs = max(1, max_concurrent_syncs)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_in_flight = max_in_flight
+
+    def mirror_url (self, repository):
+        return f"/api/v1/repository/{self.organization}/{repository}/mirror"
+
+    def run (self, repositories, wait=True):
+        """Synchronize `repositories` (a list of names).
+
+        Returns a dict keyed by repository name, whose values are dicts
+        with keys `status` (one of Quay's terminal `sync_status`es,
+        `TRIGGERED` if `wait` is false, or else `TIMEOUT` or `ERROR`),
+        `seconds` (elapsed time since the trigger) and, in case of
+        `ERROR`, `error` (the exception).
+        """
+        pending = deque(repositories)
+        in_flight = {}
+        outcomes = {}
+        interval = self.poll_interval
+
+        while pending or in_flight:
+            to_start = []
+            while pending and len(in_flight) + len(to_start) < self.max_concurrent_syncs:
+                to_start.append(pending.popleft())
+            for (repository, error) in self._trigger(to_start):
+                if error is not None:
+                    outcomes[repository] = dict(status="ERROR", seconds=0, error=error)
+                elif wait:
+                    in_flight[repository] = time.monotonic()
+                else:
+                    outcomes[repository] = dict(status="TRIGGERED", seconds=0)
+
+            if not in_flight:
+                continue
+
+            time.sleep(interval)
+            any_done = False
+            for (repository, status, error) in self._poll(list(in_flight)):
+                elapsed = round(time.monotonic() - in_flight[repository], 1)
+                if error is not None:
+                    outcomes[repository] = dict(status="ERROR", seconds=elapsed, error=error)
+                elif status in self.terminal_statuses:
+                    outcomes[repository] = dict(status=status, seconds=elapsed)
+                elif elapsed > self.timeout:
+                    outcomes[repository] = dict(status="TIMEOUT", seconds=elapsed)
+                else:
+                    continue
+                del in_flight[repository]
+                any_done = True
+
+            interval = (self.poll_interval if any_done
+                        else min(self.max_poll_interval, interval * 2))
+
+        return outcomes
+
+    def _trigger (self, repositories):
+        executor = QuayExecutor(max_in_flight=self.max_in_flight)
+        for repository in repositories:
+            executor.submit(repository, self.quay_request.post,
+                            self.mirror_url(repository) + "/sync-now")
+        return [(outcome.lane, outcome.error) for outcome in executor.run().values()]
+
+    def _poll (self, repositories):
+        executor = QuayExecutor(max_in_flight=self.max_in_flight)
+        for repository in repositories:
+            executor.submit(repository, lambda r: self.quay_request.get(
+                self.mirror_url(r)).json()["sync_status"], repository)
+        return [(outcome.lane, outcome.value, outcome.error) for outcome in executor.run().values()]
@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+PermissionChange = namedtuple("PermissionChange", ["repository", "kind", "name", "role"])
+PermissionChange.__doc__ = """A permission that needs to be set (or deleted, if `role` is None).
+
+`kind` is either `"user"` (which includes robot accounts) or `"team"`,
+following the path components of Quay's permission API.
+"""
+
+
+def permission_snapshot_key (hostname, organization, repository, username):
+    """The state snapshot key for the permission of `username` (e.g. a robot account) on one repository.
+
+    `robot_account_permission` records its single-repository outcomes
+    under this key; tasks that change such permissions by other means
+    must `forget` it.
+    """
+    return f"permissions of {username} on {hostname}/{organization}/{repository}"
+
+
+class PermissionIndex:
+    """In-memory index of the current permissions of an organization's repositories.
+
+    Build it out of as few list calls as possible (see the
+    `add_*` methods), then call `diff` to find out which
+    permissions actually need to change.
+    """
+    def __init__ (self):
+        self._roles = {}
+        self._known = set()
+
+    def add_repository_permissions (self, repository, kind, permissions):
+        """Index the full permission listing of `repository` for `kind`.
+
+        `permissions` are the items of the `permissions` field of
+        `/api/v1/repository/{org}/{repository}/permissions/{kind}/`,
+        e.g. as yielded by `QuayRequests.paginate`.
+        """
+        for permission in permissions:
+            self._roles[(repository, kind, permission["name"])] = permission["role"]
+        self._known.add((repository, kind, None))
+
+    def add_robot_permissions (self, robot_name, permissions):
+        """Index all the permissions of one robot account across the organization.
+
+        `permissions` are the items of the `permissions` field of
+        `/api/v1/organization/{org}/robots/{shortname}/permissions`.
+        """
+        for permission in permissions:
+            self._roles[(permission["repository"]["name"], "user", robot_name)] = permission["role"]
+        self._known.add((None, "user", robot_name))
+
+    def get (self, repository, kind, name):
+        """The current role of `name` on `repository`, or None.
+
+        Raises KeyError if the index has no information either way.
+        """
+        key = (repository, kind, name)
+        if key in self._roles:
+            return self._roles[key]
+        elif ((repository, kind, None) in self._known
+              or (None, kind, name) in self._known):
+            return None
+        else:
+            raise KeyError(key)
+
+    def holders (self, kind, name):
+        """The repositories on which `name` currently has any permission."""
+        return [repository for (repository, k, n) in self._roles
+                if k == kind and n == name]
+
+    def names (self, repository, kind):
+        """The teams or users (depending on `kind`) that currently have any permission on `repository`."""
+        return [name for (r, k, name) in self._roles
+                if r == repository and k == kind]
+
+    def diff (self, desired):
+        """Yield the `PermissionChange`s that would bring the index to `desired`.
+
+        `desired` is an iterable of `PermissionChange`s, where a
+        `role` of None means that there should be no permission.
+        """
+        for want in desired:
+            if self.get(want.repository, want.kind, want.name) != want.role:
+                yield want
@@ -1,10 +1,231 @@
-from abc import ABC, abstractmethod
-import functools
+# Ansible loads action plugins anew for each task, in a fresh fork.
+# Modules that only some tasks need (`requests` itself, the on-disk
+# caches, thread pools...) are therefore imported upon first use,
+# rather than here.
 
-import requests
-from requests.exceptions import HTTPError
+from abc import ABC
+import atexit
+from collections import OrderedDict, namedtuple
+import hashlib
+import threading
+import time
 
 from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.module_utils.metrics import QuayMetrics
+from ansible_collections.epfl_si.quay.plugins.module_utils.throttling import RateLimiters, RetryPolicy, is_retryable_error
+
+class QuaySessionPool:
+    """Process-wide cache of `requests.Session` objects, one per (hostname, token).
+
+    Ansible forks a new worker process for every task and host, which
+    runs all of the task's loop items; sharing one keep-alive `Session`
+    per Quay server and credential means that, within that process,
+    only the first API call pays for the TCP and TLS handshakes.
+    Sessions that stay idle for more than `idle_timeout` seconds are
+    closed and replaced, so that we don't try to reuse connections
+    that Quay's load balancer has long since dropped.
+    """
+    _sessions = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get (cls, hostname, token, maxsize=10, idle_timeout=300):
+        key = (hostname, hashlib.sha256(token.encode("utf-8")).hexdigest())
+        now = time.monotonic()
+        with cls._lock:
+            pooled = cls._sessions.get(key)
+            if pooled is not None:
+                session, last_used, pool_maxsize = pooled
+                if now - last_used > idle_timeout or pool_maxsize != maxsize:
+                    session.close()
+                    pooled = None
+
+            if pooled is None:
+                session = cls._make_session(token, maxsize)
+                pool_maxsize = maxsize
+
+            cls._sessions[key] = (session, now, pool_maxsize)
+            return session
+
+    @classmethod
+    def _make_session (cls, token, maxsize):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+        session.mount("https://", adapter)
+        session.headers["Authorization"] = f"bearer {token}"
+        return session
+
+    @classmethod
+    def close_all (cls):
+        with cls._lock:
+            for session, _, _ in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+
+atexit.register(QuaySessionPool.close_all)
+
+
+class QuayConnection (namedtuple("QuayConnection", ["hostname", "token", "token_digest"])):
+    """The resolved (i.e. templated, and decrypted if vaulted) Quay hostname and bearer token.
+
+    Instances are immutable, and therefore safe to share between
+    tasks and threads.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def make (cls, hostname, token):
+        return cls(str(hostname), str(token),
+                   hashlib.sha256(str(token).encode("utf-8")).hexdigest())
+
+    @property
+    def credentials (self):
+        """A string that identifies the connection, without disclosing the token."""
+        return f"{self.hostname} {self.token_digest}"
+
+
+class QuayConnections:
+    """Process-wide cache of `QuayConnection` objects.
+
+    Ansible forks a new worker process for every task and host, which
+    runs all of the task's loop items; within that process, templating
+    (and, for vaulted tokens, decrypting) the connection variables is
+    only done once for as long as their raw values stay the same. Raw
+    values that are Jinja templates are not cached, since they may
+    evaluate differently from one loop item to the next.
+    """
+    _connections = OrderedDict()
+    _lock = threading.Lock()
+    max_entries = 64
+
+    @classmethod
+    def get (cls, raw_hostname, raw_token, resolve):
+        """The `QuayConnection` for these raw variable values.
+
+        `resolve` is called (without arguments) to build the
+        `QuayConnection` on a cache miss.
+        """
+        key = (cls._raw_key(raw_hostname), cls._raw_key(raw_token))
+        if None in key:
+            return resolve()
+
+        with cls._lock:
+            connection = cls._connections.get(key)
+            if connection is not None:
+                cls._connections.move_to_end(key)
+                return connection
+
+        connection = resolve()
+        with cls._lock:
+            cls._connections[key] = connection
+            while len(cls._connections) > cls.max_entries:
+                cls._connections.popitem(last=False)
+        return connection
+
+    @staticmethod
+    def _raw_key (value):
+        ciphertext = getattr(value, "_ciphertext", None)
+        if ciphertext is not None:
+            return ("vault", hashlib.sha256(bytes(ciphertext)).hexdigest())
+        elif isinstance(value, str) and "{{" not in value and "{%" not in value:
+            return ("literal", hashlib.sha256(value.encode("utf-8")).hexdigest())
+        else:
+            return None
+
+
+class QuayRequests:
+    """Send requests to one Quay server, with retries, metrics and (optionally) caching.
+
+    All methods are safe to call from several threads at once.
+    """
+    def __init__ (self, url_base, session, limiter, retry_policy, metrics,
+                  cache=None, cache_credentials=None):
+        self.url_base = url_base
+        self.session = session
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        self.cache = cache
+        self.cache_credentials = cache_credentials
+
+    def request (self, method, endpoint, json, headers={}, params=None):
+        attempts = 0
+        metrics = self.metrics
+
+        def send ():
+            nonlocal attempts
+            is_retry = attempts > 0
+            attempts += 1
+            started = time.monotonic()
+            try:
+                response = self.session.request(
+                    method,
+                    f"{self.url_base}{endpoint}",
+                    json=json, headers=headers, params=params)
+            except Exception:
+                metrics.record(method, endpoint, None, time.monotonic() - started,
+                               is_retry=is_retry)
+                raise
+            metrics.record(
+                method, endpoint, response.status_code, time.monotonic() - started,
+                bytes_sent=len(response.request.body or b"") if response.request is not None else 0,
+                bytes_received=len(response.content or b""),
+                is_retry=is_retry)
+            return response
+
+        response = self.retry_policy.send(method, send, self.limiter)
+
+        if self.cache is not None and method != "GET":
+            self.cache.invalidate(self.cache_credentials, endpoint)
+
+        self._raise_for_status(response)
+        return response
+
+    def get (self, endpoint, json=None, headers={}, params=None):
+        return self.request("GET", endpoint, json, headers, params=params)
+
+    def get_cached (self, endpoint, params=None):
+        """Like `get`, except through the on-disk response cache, if configured."""
+        cache = self.cache
+        if cache is None:
+            return self.get(endpoint, params=params)
+
+        from ansible_collections.epfl_si.quay.plugins.module_utils.response_cache import CachedResponse
+
+        (entry, is_fresh) = cache.lookup(self.cache_credentials, endpoint, params)
+        if is_fresh:
+            self.metrics.record_cache_hit("GET", endpoint)
+            return CachedResponse(entry)
+
+        response = self.get(
+            endpoint, params=params,
+            headers=cache.conditional_headers(entry) if entry else {})
+        if response.status_code == 304 and entry is not None:
+            self.metrics.record_cache_hit("GET", endpoint)
+            return CachedResponse(cache.refresh(self.cache_credentials, endpoint, params, entry))
+        elif response.status_code == 200:
+            cache.store(self.cache_credentials, endpoint, params, response)
+        return response
+
+    def paginate (self, endpoint, key, params=None, prefetch=False):
+        return paginate(self.get, endpoint, key, params, prefetch)
+
+    def post (self, endpoint, json=None, headers={}):
+        return self.request("POST", endpoint, json, headers)
+
+    def put (self, endpoint, json=None, headers={}):
+        return self.request("PUT", endpoint, json, headers)
+
+    def delete (self, endpoint, json=None, headers={}):
+        return self.request("DELETE", endpoint, json, headers)
+
+    def _raise_for_status (self, response):
+        raise_for_status(response)
+
 
 class QuayActionMixin(ABC):
     """Things that are useful to more than one action plugin.
@@ -18,81 +239,185 @@ class QuayActionMixin(ABC):
     useful.
     """
 
+    @property
+    def quay_connection (self):
+        """The `QuayConnection` for this task, resolved at most once."""
+        if not hasattr(self, "_quay_connection"):
+            variables = getattr(getattr(self, "_templar", None), "available_variables", None) or {}
+            self._quay_connection = QuayConnections.get(
+                variables.get("ansible_quay_hostname"),
+                variables.get("ansible_quay_bearer_token"),
+                lambda: QuayConnection.make(
+                    self.ansible.jinja.expand("{{ ansible_quay_hostname }}"),
+                    self.ansible.jinja.expand("{{ ansible_quay_bearer_token }}")))
+        return self._quay_connection
+
     @property
     def quay_bearer_token (self):
-        return self.ansible.jinja.expand("{{ ansible_quay_bearer_token }}")
+        return self.quay_connection.token
 
     @property
     def quay_hostname (self):
-        return self.ansible.jinja.expand("{{ ansible_quay_hostname }}")
+        return self.quay_connection.hostname
+
+    def quay_setting (self, name, default=None, type=str):
+        """The value of the `ansible_quay_{name}` Ansible variable, or `default` if unset.
+
+        Each variable is only templated once per task.
+        """
+        if not hasattr(self, "_quay_settings"):
+            self._quay_settings = {}
+        if name not in self._quay_settings:
+            self._quay_settings[name] = self.ansible.jinja.expand(
+                "{{ ansible_quay_%s | default('') }}" % name)
+        value = self._quay_settings[name]
+        if value is None or value == "":
+            return default
+        return type(value)
 
     @property
-    def quay_request (self):
-        url_base = f"https://{self.quay_hostname}"
+    def quay_max_in_flight (self):
+        return self.quay_setting("max_in_flight", 8, int)
 
-        def authify (headers):
-            if "Authorization" not in headers:
-                headers["Authorization"] = f"bearer {self.quay_bearer_token}"
-            return headers
+    def quay_executor (self):
+        """A fresh `QuayExecutor`, configured from the `ansible_quay_max_in_flight` variable."""
+        from ansible_collections.epfl_si.quay.plugins.module_utils.executor import QuayExecutor
+        return QuayExecutor(max_in_flight=self.quay_max_in_flight)
 
-        class QuayRequests:
-            @classmethod
-            def request (cls, method, endpoint, json, headers={}):
-                response = requests.request(
-                    method,
-                    f"{url_base}{endpoint}",
-                    json=json, headers=authify(headers))
+    def quay_async_client (self):
+        """A new `AsyncQuayClient`, configured like `quay_request`.
 
-                cls._raise_for_status(response)
-                return response
+        Use it as `async with self.quay_async_client() as quay:` from
+        within a coroutine, that you run with `quay_async.run_async`.
+        """
+        # Imported here, because quay_async imports us:
+        from ansible_collections.epfl_si.quay.plugins.module_utils.quay_async import AsyncQuayClient
+        return AsyncQuayClient(
+            self.quay_hostname, self.quay_bearer_token,
+            max_connections=max(self.quay_setting("pool_maxsize", 10, int),
+                                self.quay_max_in_flight),
+            max_in_flight=self.quay_setting("async_max_in_flight", 1000, int),
+            idle_timeout=self.quay_setting("pool_idle_timeout", 300, float),
+            retry_policy=self.quay_retry_policy,
+            limiter=self.quay_rate_limiter,
+            metrics=self.quay_metrics,
+            cache=self.quay_response_cache,
+            cache_credentials=self.quay_connection.credentials)
 
-            @classmethod
-            def get (cls, endpoint, json=None, headers={}):
-                return cls.request("GET", endpoint, json, headers)
+    @property
+    def quay_session (self):
+        return self._pooled_session(self.quay_hostname, self.quay_bearer_token)
 
-            @classmethod
-            def post (cls, endpoint, json=None, headers={}):
-                return cls.request("POST", endpoint, json, headers)
+    def _pooled_session (self, hostname, token):
+        return QuaySessionPool.get(
+            hostname, token,
+            # Don't let concurrent requests discard each other's connections:
+            maxsize=max(self.quay_setting("pool_maxsize", 10, int),
+                        self.quay_max_in_flight),
+            idle_timeout=self.quay_setting("pool_idle_timeout", 300, float))
 
-            @classmethod
-            def put (cls, endpoint, json=None, headers={}):
-                return cls.request("PUT", endpoint, json, headers)
+    @property
+    def quay_rate_limiter (self):
+        return self._rate_limiter(self.quay_hostname)
+
+    def _rate_limiter (self, hostname):
+        return RateLimiters.get(
+            hostname,
+            rate=self.quay_setting("rate_limit", 0, float),
+            burst=self.quay_setting("rate_burst", None, float))
 
-            @classmethod
-            def delete (cls, endpoint, json=None, headers={}):
-                return cls.request("DELETE", endpoint, json, headers)
+    @property
+    def quay_retry_policy (self):
+        return RetryPolicy(
+            retries=self.quay_setting("retries", 5, int),
+            backoff=self.quay_setting("retry_backoff", 0.5, float),
+            max_backoff=self.quay_setting("retry_max_backoff", 30, float))
 
-            @classmethod
-            def _raise_for_status (cls, response):
-                """Copied n' modified from `requests`' own implementation, so that
-                the exception message contains the Kubernetes error."""
+    @property
+    def quay_response_cache (self):
+        """The on-disk `ResponseCache` to use, or None if none is configured.
 
-                def textify (buf):
-                    if isinstance(buf, bytes):
-                        try:
-                            return buf.decode("utf-8")
-                        except UnicodeDecodeError:
-                            return buf.decode("iso-8859-1")
-                    else:
-                        return buf
+        That is `ansible_quay_cache_dir` if set; otherwise, if
+        `ansible_quay_run_cache` is true, a cache that only lives for
+        the duration of the current `ansible-playbook` run, so that
+        hosts (and therefore forks) that manage the same Quay
+        resources only read them once.
+        """
+        from ansible_collections.epfl_si.quay.plugins.module_utils.response_cache import ResponseCache, run_cache_directory
 
-                reason = f"{ textify(response.reason) } - { textify(response.text) }"
+        directory = self.quay_setting("cache_dir")
+        if directory is None:
+            if not self.quay_setting("run_cache", False, _as_bool):
+                return None
+            return ResponseCache.get(
+                run_cache_directory(),
+                ttl=self.quay_setting("run_cache_ttl", 600, float),
+                max_bytes=self.quay_setting("cache_max_bytes", 64 * 1024 * 1024, int))
+        return ResponseCache.get(
+            directory,
+            ttl=self.quay_setting("cache_ttl", 3600, float),
+            max_bytes=self.quay_setting("cache_max_bytes", 64 * 1024 * 1024, int))
 
-                http_error_msg = ""
-                if 400 <= response.status_code < 500:
-                    http_error_msg = (
-                        f"{response.status_code} Client Error: {reason} for url: {response.url}"
-                    )
+    @property
+    def quay_state_snapshot (self):
+        """The `StateSnapshot` to use, or None if `ansible_quay_state_snapshot` is not set."""
+        if not hasattr(self, "_quay_state_snapshot"):
+            from ansible_collections.epfl_si.quay.plugins.module_utils.state_snapshot import StateSnapshot
 
-                elif 500 <= response.status_code < 600:
-                    http_error_msg = (
-                        f"{response.status_code} Server Error: {reason} for url: {response.url}"
-                    )
+            path = self.quay_setting("state_snapshot")
+            self._quay_state_snapshot = None if path is None else StateSnapshot(
+                path,
+                ttl=self.quay_setting("state_snapshot_ttl", 86400, float),
+                full_verify=self.quay_setting("state_snapshot_full_verify", False, _as_bool))
+        return self._quay_state_snapshot
 
-                if http_error_msg:
-                    raise HTTPError(http_error_msg, response=response)
+    @property
+    def quay_metrics (self):
+        """The `QuayMetrics` instance that records this task's API calls."""
+        if not hasattr(self, "_quay_metrics"):
+            self._quay_metrics = QuayMetrics()
+        return self._quay_metrics
 
-        return QuayRequests
+    def report_metrics (self):
+        """Publish `self.quay_metrics`, as configured by the `ansible_quay_metrics*` variables.
+
+        Action plugins should call this at the end of their `run` method.
+        """
+        if self.quay_setting("metrics", False, _as_bool):
+            self.result["quay_metrics"] = self.quay_metrics.snapshot()
+
+        metrics_file = self.quay_setting("metrics_file")
+        if metrics_file is not None:
+            self.quay_metrics.accumulate_into_file(metrics_file)
+
+    @property
+    def quay_request (self):
+        """The `QuayRequests` object to talk to Quay with, built once per task."""
+        if not hasattr(self, "_quay_requests"):
+            self._quay_requests = QuayRequests(
+                f"https://{self.quay_hostname}",
+                session=self.quay_session,
+                limiter=self.quay_rate_limiter,
+                retry_policy=self.quay_retry_policy,
+                cache=self.quay_response_cache,
+                cache_credentials=self.quay_connection.credentials,
+                metrics=self.quay_metrics)
+        return self._quay_requests
+
+    def quay_request_to (self, hostname, token):
+        """A new `QuayRequests` object, to talk to another Quay server than `quay_request`.
+
+        It is configured out of the same `ansible_quay_*` variables as
+        `quay_request` (save for the response cache), and shares this
+        task's metrics; but it has its own pool of connections and rate
+        limiter.
+        """
+        return QuayRequests(
+            f"https://{hostname}",
+            session=self._pooled_session(hostname, token),
+            limiter=self._rate_limiter(hostname),
+            retry_policy=self.quay_retry_policy,
+            metrics=self.quay_metrics)
 
     @property
     def moniker (self):
@@ -102,20 +427,225 @@ class QuayActionMixin(ABC):
         """
         return self.__class__.__name__
 
-    def changed (self, change_description):
+    @property
+    def check_mode (self):
+        """True iff Ansible runs in check mode, in which case Quay must not be written to."""
+        task = getattr(self, "_task", None)
+        return bool(getattr(task, "check_mode", False))
+
+    def changed (self, change_description, diff=None):
+        """Record a change.
+
+        `diff`, if set, is a `(before, after)` tuple describing the
+        change in a structured way; it is reported in Ansible's
+        `diff` format (see `ansible-playbook --diff`).
+        """
         AnsibleResults.update(self.result, { "changed": True })
         self.result.setdefault("actions", []).append(f"{self.moniker}: {change_description}")
+        if diff is not None:
+            (before, after) = diff
+            self.result.setdefault("diff", []).append(dict(
+                before_header=self.moniker, before=before,
+                after_header=self.moniker, after=after))
+
+    def failed (self, change_description, error=None, item=None, retryable=None):
+        """Record a failure.
 
-    def failed (self, change_description, error=None):
+        This doesn't stop anything by itself; bulk tasks should carry on
+        with the other resources. Failures accumulate in the `failures`
+        list of the result, each with the `item` (if any) of the task's
+        arguments that it concerns, and whether it is `retryable`
+        (as per `is_retryable_error`, unless `retryable` says otherwise).
+        """
         AnsibleResults.update(self.result, { "failed": True })
-        self.result["msg"] = f"{self.moniker}: {change_description}: {error if error else 'failed'}"
+        self._record_failures([dict(
+            resource=self.moniker,
+            item=item,
+            action=change_description,
+            error=str(error) if error else "failed",
+            retryable=is_retryable_error(error) if retryable is None else retryable)])
+
+    def check_unique (self, items, what, key=lambda item: item):
+        """Fail, and return False, if two of `items` have the same `key`.
+
+        Bulk tasks process each item in its own `QuayExecutor` lane;
+        duplicates would share a lane, and therefore an outcome.
+        """
+        seen = set()
+        duplicates = []
+        for item in items:
+            k = key(item)
+            if k in seen and k not in duplicates:
+                duplicates.append(k)
+            seen.add(k)
+        if duplicates:
+            self.failed(f"duplicate {what}", ", ".join(str(d) for d in duplicates))
+            return False
+        return True
+
+    def succeeded (self, item):
+        """Record that `item` (of a bulk task's arguments) was processed without error."""
+        self.result.setdefault("succeeded", []).append(item)
+
+    def merge_result (self, other_result, item=None):
+        """Fold `other_result` (the `result` of some sub-operation) into `self.result`.
+
+        `item` is recorded as the item that failures in `other_result`
+        (if any) concern, unless they say otherwise; and, if
+        `other_result` is a success, as `succeeded`.
+        """
+        if other_result.get("changed"):
+            AnsibleResults.update(self.result, { "changed": True })
+        for k in ("actions", "diff"):
+            if k in other_result:
+                self.result.setdefault(k, []).extend(other_result[k])
+        if other_result.get("failed"):
+            AnsibleResults.update(self.result, { "failed": True })
+            failures = other_result.get("failures") or [dict(
+                resource=self.moniker, action="failed", error=other_result.get("msg", "failed"),
+                retryable=False)]
+            self._record_failures([dict(failure, item=failure.get("item") or item)
+                                   for failure in failures])
+        elif item is not None:
+            self.succeeded(item)
+
+    def _record_failures (self, failures):
+        all_failures = self.result.setdefault("failures", [])
+        all_failures.extend(failures)
+        first = all_failures[0]
+        self.result["msg"] = f"{first['resource']}: {first['action']}: {first['error']}"
+        if len(all_failures) > 1:
+            self.result["msg"] += f" (and {len(all_failures) - 1} more failure(s), see `failures`)"
+
+    @property
+    def items_to_retry (self):
+        """The set of items to process again, as per the `retry_failed` task argument.
+
+        `retry_failed` is the registered result of a previous run of the
+        same task; only the items that failed in it are to be processed
+        again. Returns None if `retry_failed` is not set, or if the
+        previous run failed as a whole (i.e. for no particular item),
+        meaning that all items should be processed.
+        """
+        previous = getattr(self, "args", {}).get("retry_failed")
+        if not previous:
+            return None
+        items = set()
+        for failure in previous.get("failures", []):
+            if failure.get("item") is None:
+                return None
+            items.add(failure["item"])
+        return items
+
+    def only_retrying (self, items, key=lambda item: item):
+        """Filter `items` down to those in `items_to_retry` (if set)."""
+        retry = self.items_to_retry
+        if retry is None:
+            return items
+        return [item for item in items if key(item) in retry]
+
+
+def raise_for_status (response):
+    """Copied n' modified from `requests`' own implementation, so that
+    the exception message contains the Kubernetes error.
+
+    `response` may be a `requests.Response`, or anything with the
+    same `status_code`, `reason`, `text` and `url` attributes (e.g.
+    an `AsyncResponse`)."""
+
+    def textify (buf):
+        if isinstance(buf, bytes):
+            try:
+                return buf.decode("utf-8")
+            except UnicodeDecodeError:
+                return buf.decode("iso-8859-1")
+        else:
+            return buf
+
+    reason = f"{ textify(response.reason) } - { textify(response.text) }"
+
+    http_error_msg = ""
+    if 400 <= response.status_code < 500:
+        http_error_msg = (
+            f"{response.status_code} Client Error: {reason} for url: {response.url}"
+        )
+
+    elif 500 <= response.status_code < 600:
+        http_error_msg = (
+            f"{response.status_code} Server Error: {reason} for url: {response.url}"
+        )
+
+    if http_error_msg:
+        from requests.exceptions import HTTPError
+        raise HTTPError(http_error_msg, response=response)
+
+
+def _as_bool (value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def paginate (get, endpoint, key, params=None, prefetch=False):
+    """Stream the items of a Quay list endpoint, one page at a time.
+
+    `get` is a function that takes an endpoint and a `params=` dict,
+    and returns a `requests.Response` (e.g. `QuayRequests.get`). `key`
+    is the name of the field in the response that holds the items,
+    e.g. `"repositories"` or `"tags"`.
+
+    Both of Quay's pagination styles are supported: opaque
+    `next_page` tokens (e.g. for repositories), and `page` numbers
+    with a `has_additional` flag (e.g. for tags). Endpoints that
+    return everything at once (e.g. robots or permissions) yield
+    their items out of the single response; if said items come as a
+    dict keyed by name, its values are yielded.
+
+    At most one page is held in memory, or two if `prefetch` is true —
+    in which case the next page is fetched in a background thread
+    while the caller consumes the current one.
+    """
+    params = dict(params or {})
+
+    def next_params (page):
+        if page.get("next_page"):
+            return dict(params, next_page=page["next_page"])
+        elif page.get("has_additional"):
+            return dict(params, page=page.get("page", params.get("page", 1)) + 1)
+        else:
+            return None
+
+    def fetch (params):
+        return get(endpoint, params=params).json()
+
+    if prefetch:
+        from concurrent.futures import ThreadPoolExecutor
+    pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = fetch(params)
+        while True:
+            params = next_params(page)
+            upcoming = (pool.submit(fetch, params)
+                        if pool is not None and params is not None
+                        else None)
+
+            items = page.get(key, [])
+            yield from (items.values() if isinstance(items, dict) else items)
+
+            if params is None:
+                return
+            page = upcoming.result() if upcoming is not None else fetch(params)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
 
 
 def returns_none_on_404 (f):
     def ff (*args, **kwargs):
+        from requests.exceptions import HTTPError
         try:
             return f(*args, **kwargs)
-        except requests.HTTPError as e:
+        except HTTPError as e:
             if e.response.status_code == 404:
                 return None
             else:
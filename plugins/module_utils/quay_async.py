@@ -0,0 +1,195 @@
+"""An asyncio client for the Quay API, for operations with a high fan-out.
+
+Action plugins are synchronous; they drive this client with
+`run_async`, e.g.
+
+    async def delete_all (self, tags):
+        async with self.quay_async_client() as quay:
+            return await quay.gather(quay.delete(f"{self.api_v1_url}/tag/{t}") for t in tags)
+
+    outcomes = run_async(self.delete_all(tags))
+
+If `aiohttp` is installed, requests are multiplexed over at most
+`max_connections` connections with no thread per request; otherwise,
+we fall back to running `requests` in a thread pool of that size.
+Either way, at most `max_in_flight` requests are outstanding at any
+given time.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import json as jsonlib
+import time
+
+import requests
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuaySessionPool, raise_for_status
+from ansible_collections.epfl_si.quay.plugins.module_utils.throttling import RetryPolicy
+
+
+class AsyncResponse:
+    """The parts of `requests.Response` that this collection uses."""
+    def __init__ (self, status_code, reason, url, headers, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.url = url
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text (self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json (self):
+        return jsonlib.loads(self.content)
+
+
+class _AiohttpTransport:
+    connection_errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError) if HAS_AIOHTTP else ()
+
+    def __init__ (self, hostname, token, max_connections, idle_timeout):
+        self._connector = aiohttp.TCPConnector(limit=max_connections,
+                                               keepalive_timeout=idle_timeout)
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            headers={"Authorization": f"bearer {token}"})
+
+    async def request (self, method, url, json, headers, params):
+        async with self._session.request(method, url, json=json, headers=headers,
+                                         params=params) as r:
+            content = await r.read()
+            return AsyncResponse(r.status, r.reason, str(r.url), r.headers, content)
+
+    async def close (self):
+        await self._session.close()
+
+
+class _ThreadTransport:
+    connection_errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__ (self, hostname, token, max_connections, idle_timeout):
+        self._session = QuaySessionPool.get(hostname, token, maxsize=max_connections,
+                                            idle_timeout=idle_timeout)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_connections)
+
+    async def request (self, method, url, json, headers, params):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, functools.partial(
+                self._session.request, method, url,
+                json=json, headers=headers, params=params))
+
+    async def close (self):
+        self._pool.shutdown(wait=False)
+
+
+class AsyncQuayClient:
+    """Asynchronous counterpart of `QuayActionMixin.quay_request`.
+
+    Must be used as an async context manager. Responses that are HTTP
+    errors raise `requests.HTTPError`, with the same message format as
+    the synchronous client, so that error reporting works the same.
+    Like `QuayRequests`, writes invalidate what `cache` (if any) knows
+    about the endpoint.
+    """
+    def __init__ (self, hostname, token, max_connections=16, max_in_flight=1000,
+                  idle_timeout=300, retry_policy=None, limiter=None, metrics=None,
+                  cache=None, cache_credentials=None):
+        self.hostname = hostname
+        self.url_base = f"https://{hostname}"
+        self._token = token
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.idle_timeout = idle_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.limiter = limiter
+        self.metrics = metrics
+        self.cache = cache
+        self.cache_credentials = cache_credentials
+        self._transport = None
+        self._semaphore = None
+
+    async def __aenter__ (self):
+        transport_class = _AiohttpTransport if HAS_AIOHTTP else _ThreadTransport
+        self._transport = transport_class(self.hostname, self._token, self.max_connections,
+                                          self.idle_timeout)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__ (self, *exc_info):
+        await self._transport.close()
+        self._transport = None
+
+    async def request (self, method, endpoint, json=None, headers=None, params=None):
+        attempts = 0
+
+        async def send ():
+            nonlocal attempts
+            is_retry = attempts > 0
+            attempts += 1
+            started = time.monotonic()
+            try:
+                response = await self._transport.request(
+                    method, f"{self.url_base}{endpoint}", json, headers or {}, params)
+            except Exception:
+                if self.metrics is not None:
+                    self.metrics.record(method, endpoint, None, time.monotonic() - started,
+                                        is_retry=is_retry)
+                raise
+            if self.metrics is not None:
+                self.metrics.record(
+                    method, endpoint, response.status_code, time.monotonic() - started,
+                    bytes_sent=len(jsonlib.dumps(json)) if json is not None else 0,
+                    bytes_received=len(response.content or b""),
+                    is_retry=is_retry)
+            return response
+
+        async with self._semaphore:
+            response = await self.retry_policy.send_async(
+                method, send, self.limiter,
+                connection_errors=self._transport.connection_errors)
+
+        if self.cache is not None and method != "GET":
+            self.cache.invalidate(self.cache_credentials, endpoint)
+
+        raise_for_status(response)
+        return response
+
+    async def get (self, endpoint, params=None, headers=None):
+        return await self.request("GET", endpoint, headers=headers, params=params)
+
+    async def post (self, endpoint, json=None, headers=None):
+        return await self.request("POST", endpoint, json=json, headers=headers)
+
+    async def put (self, endpoint, json=None, headers=None):
+        return await self.request("PUT", endpoint, json=json, headers=headers)
+
+    async def delete (self, endpoint, json=None, headers=None):
+        return await self.request("DELETE", endpoint, json=json, headers=headers)
+
+    async def gather (self, coroutines):
+        """Await all of `coroutines` concurrently.
+
+        Returns their results in order; exceptions are returned (not
+        raised), so that one failure doesn't hide the others.
+        """
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+
+def run_async (coroutine):
+    """Run `coroutine` to completion from synchronous code, and return its result."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # We are being called from within an event loop (which Ansible doesn't
+    # do, but who knows); run ours in a separate thread.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
@@ -0,0 +1,322 @@
+import datetime
+import re
+
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.actions.plugins.module_utils.compare import is_substruct
+from ansible_collections.epfl_si.actions.plugins.module_utils.strings import is_same_string
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import QuayActionMixin, returns_none_on_404
+from ansible_collections.epfl_si.quay.plugins.module_utils.mirror_rules import desired_root_rule
+
+class QuayRepositoryMixin(QuayActionMixin):
+    """Operations on one Quay repository.
+
+    Classes that use this mixin must set `self.organization`,
+    `self.name` and `self.args` (the latter with the same structure as
+    the `epfl_si.quay.quay_repository` task arguments), on top of
+    what `QuayActionMixin` requires.
+    """
+
+    @property
+    def moniker (self):
+        return f"{self.quay_hostname}/{self.organization}/{self.name}"
+
+    @property
+    def api_v1_url (self):
+        return f"/api/v1/repository/{self.organization}/{self.name}"
+
+    def perform_changes (self, state):
+        if self.is_known_current(state):
+            return
+        self.reconcile(state, self.get_repository_data())
+        self.remember(state)
+        if self.quay_state_snapshot is not None:
+            self.quay_state_snapshot.save()
+
+    def desired_state (self, state):
+        """The part of `self.args` that `reconcile` acts upon.
+
+        Returns None if reconciling should never be skipped, e.g.
+        because a mirror synchronization is requested.
+        """
+        mirror = self.args.get("mirror")
+        if mirror is not None and mirror.get("sync_now"):
+            return None
+        if state == "absent":
+            return dict(state=state)
+        return dict(state=state,
+                    description=self.args["description"],
+                    visibility=self.args.get("visibility", "private"),
+                    mirror=mirror)
+
+    def is_known_current (self, state):
+        """True iff the state snapshot (if any) says that there is nothing to do."""
+        snapshot = self.quay_state_snapshot
+        desired = self.desired_state(state)
+        return (snapshot is not None and desired is not None
+                and snapshot.is_current(self.moniker, snapshot.desired_hash(desired)))
+
+    def remember (self, state):
+        """Record the outcome of a successful `reconcile` into the state snapshot (if any)."""
+        snapshot = self.quay_state_snapshot
+        desired = self.desired_state(state)
+        if snapshot is None or self.check_mode or desired is None or self.result.get("failed"):
+            return
+        snapshot.record(self.moniker, snapshot.desired_hash(desired),
+                        dict(exists=state != "absent"))
+
+    def is_snapshot_contradicted (self, exists):
+        """True iff the state snapshot (if any) is wrong about whether the repository exists.
+
+        `exists` is what Quay currently says about the repository, as
+        in `reconcile`.
+        """
+        snapshot = self.quay_state_snapshot
+        known = snapshot.get(self.moniker) if snapshot is not None else None
+        return known is not None and known.get("exists") != (exists is not None)
+
+    def reconcile (self, state, exists):
+        """Bring the repository to `state`, given its current data `exists`.
+
+        `exists` is either the JSON structure returned by Quay for this
+        repository (or an entry of the organization's repository list,
+        which has the same `description` and `is_public` fields), or
+        None if the repository does not exist.
+        """
+        if state == "absent":
+            if exists:
+                self.do_delete()
+        else:
+            description = self.args["description"]
+            visibility = self.args.get("visibility", "private")
+            if exists:
+                if not is_same_string(exists["description"],
+                                      description):
+                    self.do_update_description(description, exists["description"])
+                if "failed" in self.result:
+                    return
+
+                if exists["is_public"] != (is_same_string(
+                        visibility, "public")):
+                    self.do_update_visibility(visibility, exists["is_public"])
+            else:
+                self.do_create(description, visibility)
+
+            if "failed" in self.result:
+                return
+
+            mirror_desired = self.args.get('mirror')
+            if mirror_desired is not None:
+                # In check mode, a repository that we would have created has no mirror yet:
+                mirror_current = (self.get_mirror_info() if exists or not self.check_mode
+                                  else None)
+                self.maybe_setup_mirror(mirror_desired, mirror_current)
+                if mirror_desired.get("sync_now"):
+                    self.do_sync_now()
+
+    @returns_none_on_404
+    def get_repository_data (self):
+        return self.quay_request.get_cached(self.api_v1_url).json()
+
+
+    @property
+    def api_v1_mirror_url (self):
+        return f"{self.api_v1_url}/mirror"
+
+    @returns_none_on_404
+    def get_mirror_info (self):
+        return self.quay_request.get_cached(self.api_v1_mirror_url).json()
+
+    def do_delete (self):
+        if self.check_mode:
+            self.changed("deleted", diff=(dict(name=self.name), {}))
+            return
+
+        response = self.quay_request.delete(self.api_v1_url)
+        if response.status_code == 204:
+            self.changed("deleted")
+            if self.quay_state_snapshot is not None:
+                # Whatever we recorded about the repository (e.g. from
+                # another task, before `prune` deleted it) is moot now:
+                self.quay_state_snapshot.forget(self.moniker)
+        else:
+            self.failed(f"DELETE {self.api_v1_url}", f"failed with status {response.status_code}")
+
+    def do_create (self, description, visibility):
+        if self.check_mode:
+            self.changed("created", diff=(
+                {}, dict(name=self.name, description=description, visibility=visibility)))
+            return
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#createrepo
+        response = self.quay_request.post(
+            "/api/v1/repository",
+            dict(
+                namespace=self.organization,
+                repository=self.name,
+                description=description,
+                visibility=visibility))
+
+        if response.status_code == 201:
+            self.changed("created")
+        else:
+            self.failed("POST /api/v1/repository", f"failed with status {response.status_code}")
+
+    def do_update_description (self, description, current_description=None):
+        if self.check_mode:
+            self.changed("set description", diff=(
+                dict(description=current_description), dict(description=description)))
+            return
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#updaterepo
+        response = self.quay_request.put(
+            self.api_v1_url,
+            dict(description=description))
+        if response.status_code == 200:
+            self.changed("set description")
+        else:
+            self.failed(f"PUT {self.api_v1_url}", f"failed with status {response.status_code}")
+
+    def do_update_visibility (self, visibility, currently_public=None):
+        if self.check_mode:
+            self.changed("set visibility", diff=(
+                dict(is_public=currently_public), dict(is_public=is_same_string(visibility, "public"))))
+            return
+
+        # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#changerepovisibility
+        change_visibility_uri = f"{self.api_v1_url}/changevisibility"
+        response = self.quay_request.post(
+            change_visibility_uri,
+            dict(visibility=visibility))
+        if response.status_code == 200:
+            self.changed("set visibility")
+        else:
+            self.failed(f"POST {change_visibility_uri}", f"failed with status {response.status_code}")
+
+    def maybe_setup_mirror (self, mirror_desired, mirror_current):
+        desired_data = desired_mirror_data(mirror_desired, mirror_current)
+
+        if is_substruct(desired_data, mirror_current):
+            return  # Ansible green
+
+        if self.check_mode:
+            before = ({} if mirror_current is None
+                      else {k: mirror_current.get(k) for k in desired_data})
+            self.changed("set mirroring information" if mirror_current is None
+                         else "updated mirroring information",
+                         diff=(before, desired_data))
+            return
+
+        if mirror_current is None:
+            response = self.quay_request.post(
+                self.api_v1_mirror_url,
+                desired_data)
+            if response.status_code == 201:
+                self.changed("set mirroring information")
+            else:
+                self.failed(f"POST {self.api_v1_mirror_url}", f"failed with status {response.status_code}")
+        else:
+            response = self.quay_request.put(
+                self.api_v1_mirror_url,
+                desired_data)
+            if response.status_code == 201:
+                self.changed("updated mirroring information")
+            else:
+                self.failed(f"PUT {self.api_v1_mirror_url}", f"failed with status {response.status_code}")
+
+    def do_sync_now (self):
+        sync_now_uri = self.api_v1_mirror_url + "/sync-now"
+        if self.check_mode:
+            self.changed("Sync requested")
+            return
+
+        response = self.quay_request.post(sync_now_uri)
+        if response.status_code >= 200 and response.status_code < 300:
+            self.changed(f"Sync OK, result code: {response.status_code}")
+        else:
+            self.failed(f"Bad status {response.status_code} for {sync_now_uri}")
+
+
+class QuayRepository (QuayRepositoryMixin):
+    """One repository of a bulk task, that can be reconciled from a worker thread.
+
+    Worker threads must not call into Ansible's templating engine;
+    therefore, everything that `QuayActionMixin` would normally
+    compute out of Ansible variables comes from the `shared` dict
+    instead (with keys `quay_hostname`, `quay_request`, `check_mode`
+    and `quay_state_snapshot`), which the calling action plugin
+    fills in from the main thread.
+    """
+    def __init__ (self, shared, organization, args):
+        self._quay_hostname = shared["quay_hostname"]
+        self._quay_request = shared["quay_request"]
+        self._check_mode = shared["check_mode"]
+        self._quay_state_snapshot = shared["quay_state_snapshot"]
+        self.organization = organization
+        self.name = args["name"]
+        self.args = args
+        self.result = AnsibleResults.empty()
+
+    @property
+    def quay_hostname (self):
+        return self._quay_hostname
+
+    @property
+    def quay_request (self):
+        return self._quay_request
+
+    @property
+    def check_mode (self):
+        return self._check_mode
+
+    @property
+    def quay_state_snapshot (self):
+        return self._quay_state_snapshot
+
+    @property
+    def state (self):
+        return self.args.get("state", "present")
+
+    def needs_reconciling (self, exists):
+        if self.state == "absent":
+            return exists is not None
+        elif exists is None:
+            return True
+        elif self.args.get("mirror") is not None:
+            return True
+        else:
+            return not (
+                is_same_string(exists["description"], self.args["description"])
+                and exists["is_public"] == is_same_string(
+                    self.args.get("visibility", "private"), "public"))
+
+
+def desired_mirror_data (mirror_desired, mirror_current):
+    """The mirror configuration to send to Quay, given the `mirror` task argument.
+
+    `mirror_current` is the current mirror configuration (as
+    returned by Quay), or None if there is none.
+    """
+    # https://docs.redhat.com/en/documentation/red_hat_quay/3/html-single/red_hat_quay_api_guide/index#quay-mirror-api
+    desired_data = dict(
+            is_enabled=True,
+            external_reference=mirror_desired["from"],
+            robot_username=mirror_desired["robot_account"],
+            sync_interval=mirror_desired.get("sync_interval", None),
+            sync_start_date=mirror_desired.get("sync_start_date", None),
+            skopeo_timeout_interval=mirror_desired.get("timeout_seconds", 600),
+            root_rule=desired_root_rule(
+                mirror_desired,
+                mirror_current["root_rule"] if mirror_current is not None else None))
+
+    if desired_data["sync_interval"] is None:
+        desired_data["sync_interval"] = (
+            mirror_current["sync_interval"] if mirror_current is not None
+            else 3600)
+
+    if desired_data["sync_start_date"] is None:
+        desired_data["sync_start_date"] = (
+            re.sub(r"[.]\d+Z$", "Z", mirror_current["sync_start_date"])
+            if mirror_current is not None
+            else datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+    return desired_data
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+
+class CachedResponse:
+    """Quacks enough like a `requests.Response` for the purposes of this collection."""
+    def __init__ (self, entry):
+        self.status_code = entry["status_code"]
+        self.url = entry["url"]
+        self.headers = entry["headers"]
+        self.text = entry["text"]
+        self.reason = "OK (cached)"
+        self.from_cache = True
+
+    def json (self):
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """On-disk cache of Quay GET responses, with validators and LRU eviction.
+
+    Entries are JSON files laid out as
+    `{directory}/{credentials hash}/{resource hash}/{request hash}.json`,
+    where the *resource* is the first few path components of the
+    endpoint (e.g. `/api/v1/repository/myorg/myrepo`); this makes
+    it cheap to invalidate everything we know about a resource after
+    writing to it.
+
+    An entry younger than `ttl` seconds is served as-is. An older one
+    is revalidated with a conditional request if Quay sent an `ETag`
+    or `Last-Modified` header with it, and refetched otherwise.
+
+    Files are written atomically, so that several Ansible forks may
+    share the same directory. Whenever the total size of the
+    directory exceeds `max_bytes`, the least recently used entries
+    are deleted.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    evict_every = 100
+
+    def __init__ (self, directory, ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._stores = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get (cls, directory, ttl=3600, max_bytes=64 * 1024 * 1024):
+        """Return the process-wide `ResponseCache` instance for `directory`."""
+        with cls._instances_lock:
+            cache = cls._instances.get(directory)
+            if cache is None:
+                cache = cls(directory, ttl, max_bytes)
+                cls._instances[directory] = cache
+            cache.ttl = ttl
+            cache.max_bytes = max_bytes
+            return cache
+
+    def lookup (self, credentials, endpoint, params=None):
+        """Returns `(entry, is_fresh)`, or `(None, False)` on cache miss."""
+        path = self._path(credentials, endpoint, params)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return (None, False)
+
+        try:
+            os.utime(path)   # For LRU eviction
+        except OSError:
+            pass
+        return (entry, time.time() - entry["stored_at"] < self.ttl)
+
+    @staticmethod
+    def conditional_headers (entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store (self, credentials, endpoint, params, response):
+        entry = dict(
+            status_code=response.status_code,
+            url=response.url,
+            headers={k: v for k, v in response.headers.items()
+                     if k.lower() in ("content-type", "etag", "last-modified")},
+            text=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            stored_at=time.time())
+        self._write(self._path(credentials, endpoint, params), entry)
+        return entry
+
+    def refresh (self, credentials, endpoint, params, entry):
+        """Mark `entry` as fresh again, after a `304 Not Modified` response."""
+        entry = dict(entry, stored_at=time.time())
+        self._write(self._path(credentials, endpoint, params), entry)
+        return entry
+
+    def invalidate (self, credentials, endpoint):
+        """Forget everything cached about the resource that `endpoint` belongs to."""
+        shutil.rmtree(os.path.join(self.directory, self._hash(credentials),
+                                   self._hash(self.resource_of(endpoint))),
+                      ignore_errors=True)
+
+    @staticmethod
+    def resource_of (endpoint):
+        return "/".join(endpoint.split("?", 1)[0].split("/")[:6])
+
+    def _path (self, credentials, endpoint, params):
+        request_key = json.dumps([endpoint, sorted((params or {}).items())])
+        return os.path.join(self.directory, self._hash(credentials),
+                            self._hash(self.resource_of(endpoint)),
+                            self._hash(request_key) + ".json")
+
+    @staticmethod
+    def _hash (s):
+        return hashlib.sha256(s.encode("utf-8")).hexdigest()[:32]
+
+    def _write (self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._stores += 1
+            should_evict = self._stores % self.evict_every == 1
+        if should_evict:
+            self.evict()
+
+    def evict (self):
+        files = []
+        total = 0
+        for (dirpath, _, filenames) in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        files.sort()
+        for (_, size, path) in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def run_cache_directory ():
+    """A private directory, shared by all the forks of the current Ansible run.
+
+    Ansible forks its workers out of the `ansible-playbook` process,
+    whose PID therefore identifies the run. Directories left behind by
+    runs whose process is gone are deleted (at most once per process).
+
+    Raises `PermissionError` if the per-user base directory (which
+    lives in the world-writable temporary directory) is not a real
+    directory, private to the current user; someone else could
+    otherwise have planted it, and read or poison the cached responses.
+    """
+    base = os.path.join(tempfile.gettempdir(), f"ansible-quay-{os.getuid()}")
+    os.makedirs(base, mode=0o700, exist_ok=True)
+    st = os.lstat(base)
+    if not (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+            and stat.S_IMODE(st.st_mode) == 0o700):
+        raise PermissionError(
+            f"Refusing to use {base} as the run cache: it must be a directory "
+            "(not a symlink) owned by the current user, with mode 0700")
+
+    global _swept
+    if not _swept:
+        _swept = True
+        for name in os.listdir(base):
+            if name.startswith("run-") and not _is_alive(name[len("run-"):]):
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+    directory = os.path.join(base, f"run-{os.getppid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return directory
+
+
+_swept = False
+
+
+def _is_alive (pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
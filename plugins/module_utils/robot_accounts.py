@@ -0,0 +1,58 @@
+import copy
+import hashlib
+import threading
+import time
+
+
+class RobotListingCache:
+    """In-process cache of organizations' robot account listings.
+
+    Quay only returns robot tokens as part of the full listing of an
+    organization's robots (`/api/v1/organization/{org}/robots`), which
+    is costly to fetch once per robot. This cache keeps each listing
+    for `ttl` seconds, keyed by (hostname, organization, token) so that
+    a listing fetched with one set of credentials is never served to
+    another.
+
+    Plugins that create or delete robot accounts should call
+    `invalidate` afterwards.
+    """
+    _listings = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get (cls, hostname, token, organization, fetch, ttl=60):
+        """Return the list of robots of `organization`, calling `fetch()` if needed.
+
+        `fetch` takes no arguments and returns the `robots` list from
+        the Quay API. The returned list is a deep copy, which callers
+        are free to modify.
+        """
+        key = cls._key(hostname, token, organization)
+        now = time.monotonic()
+        with cls._lock:
+            cached = cls._listings.get(key)
+        if cached is not None and cached[0] > now:
+            robots = cached[1]
+        else:
+            robots = fetch()
+            with cls._lock:
+                cls._listings[key] = (now + ttl, robots)
+        return copy.deepcopy(robots)
+
+    @classmethod
+    def invalidate (cls, hostname=None, organization=None):
+        """Forget the listings of `organization` on `hostname`, regardless of token.
+
+        Passing None for either parameter acts as a wildcard.
+        """
+        with cls._lock:
+            for key in list(cls._listings):
+                (h, o, _) = key
+                if ((hostname is None or h == hostname) and
+                    (organization is None or o == organization)):
+                    del cls._listings[key]
+
+    @staticmethod
+    def _key (hostname, token, organization):
+        return (hostname, organization, hashlib.sha256(token.encode("utf-8")).hexdigest())
@@ -0,0 +1,116 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+
+
+class StateSnapshot:
+    """A local record of what we last knew to be true in Quay, to skip redundant work.
+
+    For each resource (keyed by a string such as
+    `quay.example.com/myorg/myrepo`), the snapshot file remembers the
+    hash of the desired state that was last successfully applied,
+    when that was, and the resulting state as observed in Quay (e.g.
+    whether the resource exists). A task whose desired state hashes
+    the same as what the snapshot holds, and whose snapshot entry is
+    younger than `ttl` seconds, can skip reading from Quay altogether.
+    Entries that are older get verified for real, which catches drift
+    (changes made outside of Ansible) eventually; expiry dates are
+    spread over ±10% of `ttl`, so that a large inventory doesn't get
+    verified all in the same run. Tasks that read from Quay anyway
+    should compare what they see with `get`, and disregard entries
+    that it contradicts.
+
+    The file is JSON, and is updated under an exclusive lock so that
+    Ansible forks may share it.
+    """
+    version = 1
+
+    def __init__ (self, path, ttl=86400, full_verify=False):
+        self.path = path
+        self.ttl = ttl
+        self.full_verify = full_verify
+        self._resources = self._load()
+        self._updates = {}
+
+    @staticmethod
+    def desired_hash (desired):
+        return hashlib.sha256(json.dumps(desired, sort_keys=True, default=str)
+                              .encode("utf-8")).hexdigest()[:32]
+
+    def is_current (self, key, desired_hash):
+        if self.full_verify:
+            return False
+        entry = self._updates.get(key, self._resources.get(key))
+        if entry is None or entry["hash"] != desired_hash:
+            return False
+        return time.time() < entry["at"] + self.ttl * self._spread(key)
+
+    def get (self, key):
+        """The last-known state of resource `key`, or None."""
+        entry = self._updates.get(key, self._resources.get(key))
+        return entry["state"] if entry else None
+
+    def record (self, key, desired_hash, state):
+        """Remember that `key` was successfully brought to `state`, as per `desired_hash`.
+
+        Call `save` to write the changes to disk.
+        """
+        self._updates[key] = dict(hash=desired_hash, at=time.time(), state=state)
+
+    def forget (self, key):
+        """Drop what we know about `key`, e.g. after deleting it by other means than its own task."""
+        self._updates[key] = None
+
+    def save (self):
+        if not self._updates:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                resources = self._parse(f.read())
+                for (key, entry) in self._updates.items():
+                    if entry is None:
+                        resources.pop(key, None)
+                    else:
+                        resources[key] = entry
+                f.seek(0)
+                f.truncate()
+                json.dump(dict(version=self.version, resources=resources), f,
+                          separators=(",", ":"), sort_keys=True)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self._resources = resources
+        self._updates = {}
+
+    def _load (self):
+        try:
+            with open(self.path) as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                try:
+                    return self._parse(f.read())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        except FileNotFoundError:
+            return {}
+
+    def _parse (self, text):
+        if not text.strip():
+            return {}
+        try:
+            snapshot = json.loads(text)
+        except ValueError:
+            return {}   # Corrupt; start over
+        if snapshot.get("version") != self.version:
+            return {}   # Don't try to make sense of future (or past) formats
+        return {key: entry for (key, entry) in snapshot.get("resources", {}).items()
+                if isinstance(entry, dict) and {"hash", "at", "state"} <= entry.keys()}
+
+    @staticmethod
+    def _spread (key):
+        """A stable pseudo-random factor between 0.9 and 1.1."""
+        return 0.9 + int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:4], 16) / 0xffff * 0.2
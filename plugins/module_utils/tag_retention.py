@@ -0,0 +1,60 @@
+import fnmatch
+import re
+import time
+
+
+class RetentionPolicy:
+    """Decide which tags of a repository have expired.
+
+    A tag is kept if any of the following holds:
+
+    - its name matches one of the `protect` globs;
+    - it is among the `keep_last` most recent (unprotected) tags;
+    - it is less than `keep_days` days old.
+
+    At least one of `keep_last` (which must then be at least 1) or
+    `keep_days` (which must then be positive) must be set, so that a
+    policy can never expire all tags of a repository by mistake.
+    """
+    def __init__ (self, keep_last=None, keep_days=None, protect=(), now=None):
+        if keep_last is None and keep_days is None:
+            raise ValueError("At least one of keep_last or keep_days must be set")
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        if keep_days is not None and keep_days <= 0:
+            raise ValueError("keep_days must be positive")
+        self.keep_last = keep_last
+        self.keep_days = keep_days
+        self._protect = (re.compile("|".join(fnmatch.translate(glob) for glob in protect))
+                         if protect else None)
+        self._cutoff = (None if keep_days is None
+                        else (now if now is not None else time.time()) - keep_days * 86400)
+
+    def is_protected (self, name):
+        return self._protect is not None and self._protect.match(name) is not None
+
+    def expired (self, tags):
+        """Yield the tags that have expired, out of the `tags` iterable.
+
+        `tags` must be sorted from newest to oldest (which is the order
+        in which Quay lists them); they are consumed lazily, so that
+        `tags` can be a `paginate` stream of any size.
+        """
+        unprotected_seen = 0
+        for tag in tags:
+            if self.is_protected(tag["name"]):
+                continue
+            unprotected_seen += 1
+            if self.keep_last is not None and unprotected_seen <= self.keep_last:
+                continue
+            if self._cutoff is not None and tag_timestamp(tag) >= self._cutoff:
+                continue
+            yield tag
+
+
+def tag_timestamp (tag):
+    """The creation time of `tag` (an item of Quay's tag listing), in seconds since the epoch."""
+    if tag.get("start_ts") is not None:
+        return tag["start_ts"]
+    # Should not happen; err on the side of keeping the tag.
+    return time.time()
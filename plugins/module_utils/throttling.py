@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """A thread-safe, adaptive token-bucket rate limiter.
+
+    `acquire()` blocks until a request may be sent, so that no more
+    than `rate` requests per second go out on average (with bursts of
+    up to `burst` requests). Whenever the server says we are going too
+    fast (`throttled()`), the rate is halved; every successful request
+    (`succeeded()`) then nudges it back up towards the configured
+    maximum. This additive-increase, multiplicative-decrease scheme
+    converges on the highest throughput that the server will sustain.
+
+    A `rate` of 0 (or None) disables rate limiting altogether.
+    """
+    def __init__ (self, rate, burst=None):
+        self.max_rate = rate or 0
+        self.rate = self.max_rate
+        self.burst = burst or max(1, self.max_rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire (self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async (self):
+        wait = self.reserve()
+        if wait:
+            import asyncio
+            await asyncio.sleep(wait)
+
+    def reserve (self):
+        """Take a token, and return how long to wait (possibly 0) before using it.
+
+        When the bucket is empty, it goes into debt: each caller is
+        handed the next free slot in line, so that it only needs to
+        sleep once, however many other callers are waiting.
+        """
+        if not self.max_rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def throttled (self):
+        if not self.max_rate:
+            return
+        with self._lock:
+            self.rate = max(self.max_rate / 64, self.rate / 2)
+
+    def succeeded (self):
+        if not self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class RateLimiters:
+    """Process-wide registry of `TokenBucket`s, one per Quay hostname.
+
+    Ansible runs each task in a worker process of its own, so rates are
+    only enforced within one task (and its loop items); `forks` tasks
+    running in parallel each get the full rate.
+    """
+    _limiters = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get (cls, hostname, rate, burst=None):
+        with cls._lock:
+            limiter = cls._limiters.get(hostname)
+            if limiter is None or limiter.max_rate != (rate or 0) or (
+                    burst and limiter.burst != burst):
+                limiter = TokenBucket(rate, burst)
+                cls._limiters[hostname] = limiter
+            return limiter
+
+
+class RetryPolicy:
+    """Retry throttled or failed requests, with exponential backoff and jitter.
+
+    HTTP 429 and 503 mean that Quay did not process the request, so
+    they are retried regardless of the method. Other server errors
+    (including a 502 or 504 from a proxy, which may have given up on a
+    request that Quay went on to process) and connection errors are
+    only retried for idempotent methods. A `Retry-After` header, if
+    present, takes precedence over the computed backoff.
+    """
+    always_retried = frozenset((429, 503))
+    idempotent_methods = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS"))
+
+    def __init__ (self, retries=5, backoff=0.5, max_backoff=30):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def send (self, method, send, limiter=None):
+        """Call `send()` (which performs one HTTP request) until it is not worth retrying.
+
+        Returns the last `requests.Response`, whatever its status;
+        raises the last `requests.ConnectionError` or
+        `requests.Timeout` if we ran out of retries.
+        """
+        import requests
+
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if not (attempt < self.retries and method.upper() in self.idempotent_methods):
+                    raise
+                delay = self.delay(attempt)
+            else:
+                if response.status_code == 429 and limiter is not None:
+                    limiter.throttled()
+                if not (attempt < self.retries and self.is_retryable(method, response)):
+                    if response.status_code < 400 and limiter is not None:
+                        limiter.succeeded()
+                    return response
+                delay = self.delay(attempt, response)
+
+            attempt += 1
+            time.sleep(delay)
+
+    async def send_async (self, method, send, limiter=None, connection_errors=None):
+        """Like `send`, except that `send` is a coroutine function, and we don't block the event loop.
+
+        `connection_errors` defaults to `requests.ConnectionError` and
+        `requests.Timeout`.
+        """
+        import asyncio
+
+        if connection_errors is None:
+            import requests
+            connection_errors = (requests.ConnectionError, requests.Timeout)
+
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async()
+
+            try:
+                response = await send()
+            except connection_errors:
+                if not (attempt < self.retries and method.upper() in self.idempotent_methods):
+                    raise
+                delay = self.delay(attempt)
+            else:
+                if response.status_code == 429 and limiter is not None:
+                    limiter.throttled()
+                if not (attempt < self.retries and self.is_retryable(method, response)):
+                    if response.status_code < 400 and limiter is not None:
+                        limiter.succeeded()
+                    return response
+                delay = self.delay(attempt, response)
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def is_retryable (self, method, response):
+        if response.status_code in self.always_retried:
+            return True
+        return (response.status_code >= 500 and
+                method.upper() in self.idempotent_methods)
+
+    def delay (self, attempt, response=None):
+        retry_after = self._parse_retry_after(response)
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after) + random.uniform(0, self.backoff)
+        # “Full jitter”, as per https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after (response):
+        if response is None:
+            return None
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        import datetime
+        import email.utils
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            # `-0000` means UTC, as far as HTTP is concerned
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        return max(0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def is_retryable_error (error):
+    """Whether `error` (an exception, message or None) is likely to go away if tried again later.
+
+    That is the case of connection errors, timeouts and the HTTP
+    statuses that `RetryPolicy` retries, even when we already ran out
+    of retries. Anything else (e.g. HTTP 4xx) is deemed permanent.
+    """
+    if not isinstance(error, Exception):
+        return False
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        return status_code in RetryPolicy.always_retried or status_code >= 500
+
+    import requests
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, TimeoutError))
@@ -0,0 +1,79 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_drift_report.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_drift_report
+short_description: Report how a Quay organization differs from the desired state
+description:
+- This read-only task compares the repositories (and their mirror
+  configuration), robot accounts and robot permissions of an
+  organization with the desired state, and returns a structured
+  C(drift) report. It never changes anything, and is meant as a fast
+  pre-flight check before a long converge.
+
+- It uses as few API calls as possible. One paginated listing covers
+  the repositories. One call each covers the robot accounts and each
+  robot's permissions. Repositories with a C(mirror) configuration
+  cost one more call each.
+
+- The C(drift) result has one key per section that was asked for
+  (C(repositories), C(mirrors), C(robots) and C(permissions)). Each
+  maps to lists of C(missing), C(unexpected) and/or C(changed)
+  entries. C(drift_detected) is true iff any of these lists is non-empty.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace to check
+  repositories:
+    type: list
+    description: The desired repositories, in the same format as for C(epfl_si.quay.quay_repositories)
+  robots:
+    type: list
+    description: The desired robot accounts, in the same format as for C(epfl_si.quay.robot_accounts)
+  permissions:
+    type: list
+    description:
+    - The desired robot permissions. Each entry is a dict with keys
+      C(robot) (in C(organization+shortname) form), C(repository),
+      and optionally C(permission) (default C(read)) and C(state).
+  exclusive:
+    type: bool
+    default: false
+    description:
+    - Whether to also report repositories, robot accounts and
+      permissions (of the robots listed in C(permissions)) that exist
+      in Quay but are not mentioned.
+  fail_on_drift:
+    type: bool
+    default: false
+    description: Whether the task should fail if any drift is detected
+"""
+
+EXAMPLES = r"""
+- name: Pre-flight check
+  epfl_si.quay.quay_drift_report:
+    organization: myorg
+    repositories: "{{ my_repositories }}"
+    robots: [puller, pusher]
+    permissions:
+      - robot: myorg+puller
+        repository: myrepo
+        permission: read
+  register: _drift
+
+- ansible.builtin.debug:
+    var: _drift.drift
+  when: _drift.drift_detected
+"""
@@ -0,0 +1,78 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_mirror_sync.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_mirror_sync
+short_description: Synchronize the mirrors of many Quay repositories
+description:
+- Trigger an immediate synchronization of the mirror of each of the
+  given repositories (like the C(mirror.sync_now) option of
+  C(epfl_si.quay.quay_repository) does), and wait for them to
+  complete.
+
+- At most C(max_concurrent_syncs) synchronizations run at the same
+  time; the next repository is triggered as soon as one completes.
+
+- The C(mirrors) result maps each repository name to a dict with its
+  final C(status) (C(SUCCESS), C(FAIL), C(CANCEL), C(TIMEOUT),
+  C(ERROR) or, if C(wait) is false, C(TRIGGERED)) and the elapsed
+  time in C(seconds). The task fails if any synchronization does not
+  succeed.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace in which the repositories live
+  repositories:
+    type: list
+    required: true
+    description: The names of the (mirrored) repositories to synchronize
+  wait:
+    type: bool
+    default: true
+    description: Whether to wait for the synchronizations to complete
+  max_concurrent_syncs:
+    type: int
+    default: 5
+    description: How many synchronizations may be in progress at the same time
+  timeout:
+    type: int
+    default: 3600
+    description: How long (in seconds) to wait for each synchronization
+  poll_interval:
+    type: int
+    default: 5
+    description: Initial delay (in seconds) between polls of the synchronization status
+  max_poll_interval:
+    type: int
+    default: 60
+    description: Maximum delay (in seconds) between polls, when no synchronization completes for a while
+  retry_failed:
+    type: dict
+    description:
+    - The registered result of a previous run of this same task. If
+      set, only the repositories that failed in that run are
+      synchronized again.
+    - Items are repository names; see C(epfl_si.quay.quay_repositories)
+      for the structure of C(succeeded) and C(failures). A C(TIMEOUT)
+      counts as retryable.
+"""
+
+EXAMPLES = r"""
+- name: Resynchronize all mirrors
+  epfl_si.quay.quay_mirror_sync:
+    organization: myorg
+    repositories: "{{ my_mirrored_repositories }}"
+    max_concurrent_syncs: 10
+"""
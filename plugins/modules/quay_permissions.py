@@ -0,0 +1,82 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_permissions.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_permissions
+short_description: Synchronize team and robot permissions on many Quay repositories
+description:
+- Grant, update or revoke the permissions of teams, robot accounts and
+  users on many repositories of an organization, in one task.
+
+- The permission table of each mentioned repository is read once (one
+  API call for teams, one for users and robots), concurrently (see
+  C(ansible_quay_max_in_flight) in the README). Only the permissions
+  that differ are then updated, also concurrently.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace in which the repositories live
+  permissions:
+    type: list
+    required: true
+    description:
+    - The desired permission matrix. Each entry is a dict with key
+      C(repository); exactly one of C(team), C(robot) (either in
+      C(organization+shortname) form, or just the short name) or
+      C(user); and optionally C(permission) (one of V(read), V(write)
+      or V(admin); default V(read)) and C(state) (V(present) or
+      V(absent)).
+  exclusive:
+    type: bool
+    default: false
+    description:
+    - Whether to revoke all the team and robot permissions on the
+      mentioned repositories, that are not listed in C(permissions).
+      (Permissions of plain users are only ever revoked explicitly,
+      with C(state=absent).)
+  retry_failed:
+    type: dict
+    description:
+    - The registered result of a previous run of this same task. If
+      set, only the permissions that failed in that run are processed
+      again, and C(exclusive) is ignored.
+    - Items are C(repository/kind/name) strings, where C(kind) is
+      V(team) or V(user); see C(epfl_si.quay.quay_repositories) for
+      the structure of C(succeeded) and C(failures).
+"""
+
+EXAMPLES = r"""
+- name: Grant access to the team and CI robot on our repositories
+  epfl_si.quay.quay_permissions:
+    organization: myorg
+    exclusive: true
+    permissions:
+      - repository: myrepo
+        team: developers
+        permission: write
+      - repository: myrepo
+        robot: ci
+        permission: write
+      - repository: myotherrepo
+        team: developers
+
+- name: Revoke one team's access
+  epfl_si.quay.quay_permissions:
+    organization: myorg
+    permissions:
+      - repository: myrepo
+        team: contractors
+        state: absent
+"""
@@ -0,0 +1,75 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_replicate.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_replicate
+short_description: Replicate an organization's configuration from one Quay server to others
+description:
+- Read the repositories (with their description and visibility), the
+  mirror configurations and the robot accounts of an organization
+  from the source Quay server (C(ansible_quay_hostname)) once, then
+  reconcile each of the C(targets) to match, all at the same time.
+
+- Each target server gets its own pool of keep-alive connections
+  and its own rate limiter; all the C(ansible_quay_*) tuning
+  variables (see the README) apply to every one of them.
+
+- Robot accounts are replicated by name and description; each Quay
+  server issues its own tokens. Mirror configurations are replicated
+  save for the credentials to the external registry, which Quay
+  doesn't disclose. Robot accounts named in mirror configurations are
+  renamed into the target organization, if it is different.
+
+- The task fails if any target fails, but the other targets are
+  still reconciled; C(failures) tell them apart (see
+  C(epfl_si.quay.quay_repositories) for the structure).
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the source Quay server.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to read the source Quay server with.
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace to replicate
+  targets:
+    type: list
+    required: true
+    description:
+    - The Quay servers to replicate to. Each entry is a dict with keys
+      C(hostname) and C(bearer_token), and optionally C(organization)
+      (which defaults to the source organization's name).
+  replicate:
+    type: list
+    default: [repositories, mirrors, robots]
+    description:
+    - What to replicate. V(mirrors) requires V(repositories).
+  prune:
+    type: bool
+    default: false
+    description:
+    - Whether to delete the repositories (and robot accounts, if
+      replicated) of the target organizations that don't exist in
+      the source organization.
+"""
+
+EXAMPLES = r"""
+- name: Replicate production's configuration to staging and DR
+  epfl_si.quay.quay_replicate:
+    organization: myorg
+    targets:
+      - hostname: quay-staging.example.com
+        bearer_token: "{{ quay_staging_token }}"
+      - hostname: quay-dr.example.com
+        bearer_token: "{{ quay_dr_token }}"
+  vars:
+    ansible_quay_hostname: quay.example.com
+    ansible_quay_bearer_token: "{{ quay_prod_token }}"
+"""
@@ -0,0 +1,72 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_repositories.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_repositories
+short_description: Manage all the repositories of a Quay organization in one task
+description:
+- This is the bulk counterpart of C(epfl_si.quay.quay_repository). It
+  fetches the list of the organization's repositories once, compares
+  it to the desired list, and only issues API calls for the
+  repositories that need creating, updating or deleting.
+
+- Repositories that have a C(mirror) configuration always cost one
+  more API call each, because Quay does not return mirroring information
+  in the repository list.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace (first path component of the images' URL) in which the repositories live
+  repositories:
+    type: list
+    required: true
+    description:
+    - The desired repositories. Each entry takes the same options as
+      the C(epfl_si.quay.quay_repository) task (C(name), C(state),
+      C(description), C(visibility) and C(mirror)), save for
+      C(organization).
+  prune:
+    type: bool
+    default: false
+    description: Whether to delete the organization's repositories that are not listed in C(repositories)
+  retry_failed:
+    type: dict
+    description:
+    - The registered result of a previous run of this same task. If
+      set, only the items that failed in that run are processed
+      again, and C(prune) is ignored.
+    - Whether or not the task fails, its result lists the items that
+      it processed successfully in C(succeeded) (repository names), and its
+      failures in C(failures). Each of the latter has the C(item) it
+      concerns, the C(error), and whether it is C(retryable) (e.g. a
+      timeout or a HTTP 5xx error) rather than permanent.
+"""
+
+EXAMPLES = r"""
+- name: All our repositories
+  epfl_si.quay.quay_repositories:
+    organization: myorg
+    prune: true
+    repositories:
+      - name: myrepo
+        description: My new repo.
+        visibility: public
+      - name: mymirror
+        description: Mirror of ghcr.io/foo/bar
+        mirror:
+          from: ghcr.io/foo/bar
+          tags: v17,v18
+          robot_account: myrobot
+"""
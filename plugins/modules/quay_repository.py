@@ -55,7 +55,33 @@ options:
       tags:
         type: list
         required: true
-        description: The list of tags to mirror, as strings
+        description:
+        - The list of tags (or tag globs) to mirror, as strings. A
+          comma-separated string is also accepted.
+        - Order and duplicates don't matter; if the set of tags is the
+          same as the one currently configured in Quay, nothing changes.
+      tags_mode:
+        type: str
+        default: V(replace)
+        description:
+        - How to combine C(tags) with the tags currently configured in Quay.
+        - V(replace) makes the mirror rule consist of exactly C(tags).
+        - V(add) adds C(tags) to the current ones (if they are not there already).
+        - V(remove) removes C(tags) from the current ones.
+      remove_tags:
+        type: list
+        description: Tags to remove from the mirror rule, after C(tags) and C(tags_mode) are applied.
+      rule_kind:
+        type: str
+        default: V(tag_glob_csv)
+        description:
+        - The kind of Quay mirror rule to set up. C(tags), C(tags_mode)
+          and C(remove_tags) apply to V(tag_glob_csv) rules; for other
+          rule kinds, C(rule_value) (or failing that, C(tags)) is sent
+          to Quay verbatim.
+      rule_value:
+        type: raw
+        description: The rule value, for rule kinds other than V(tag_glob_csv)
       sync_interval:
         type: str
         default: 3600
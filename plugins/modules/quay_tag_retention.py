@@ -0,0 +1,73 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/quay_tag_retention.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: quay_tag_retention
+short_description: Prune the old tags of a Quay repository
+description:
+- Delete the tags of a repository that fall outside of a retention
+  policy. A tag is kept if its name matches one of the C(protect)
+  globs, or if it is among the C(keep_last) most recent (unprotected)
+  tags, or if it is less than C(keep_days) days old; all other tags
+  are deleted.
+
+- At least one of C(keep_last) or C(keep_days) must be set. C(keep_last)
+  must be at least 1, and C(keep_days) positive; use C(protect) to
+  keep specific tags.
+
+- The tag history is read one page at a time, so that repositories
+  with tens of thousands of tags don't need to fit in memory. Expired
+  tags are then deleted concurrently by the asyncio client (see
+  C(ansible_quay_async_max_in_flight) in the README), at most
+  C(delete_rate) per second.
+
+- The C(expired) result lists the names of the tags that fall outside
+  of the policy, and C(deleted) the ones that were actually deleted.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace in which the repository lives
+  repository:
+    type: str
+    required: true
+    description: The name of the repository to prune
+  keep_last:
+    type: int
+    description: How many of the most recent (unprotected) tags to keep
+  keep_days:
+    type: int
+    description: Keep tags that are younger than this many days
+  protect:
+    type: list
+    default: []
+    description: Globs (e.g. V(v*) or V(latest)) of tag names that are never deleted
+  delete_rate:
+    type: float
+    default: 0
+    description: Maximum number of tag deletions per second, or 0 for no limit (other than C(ansible_quay_rate_limit))
+"""
+
+EXAMPLES = r"""
+- name: Keep the last 20 builds, plus anything from the past month, plus releases
+  epfl_si.quay.quay_tag_retention:
+    organization: myorg
+    repository: myrepo
+    keep_last: 20
+    keep_days: 30
+    protect:
+      - latest
+      - "v*"
+    delete_rate: 10
+"""
@@ -7,7 +7,13 @@ DOCUMENTATION = r"""
 module: robot_account_permission
 short_description: Manage one permission for a robot account
 description:
-- TODO
+- Grant, update or revoke the permission of a robot account on one
+  repository (C(repository_name)), or on many repositories at once
+  (C(repositories)).
+
+- In the latter case, the robot's permissions across the whole
+  organization are fetched in a single API call, and only the
+  permissions that differ are updated.
 
 - "This action plugin reads from the following Ansible variables:"
 
@@ -28,14 +34,35 @@ options:
     description: The Quay namespace (first path component of the images' URL) in which the repository lives
   repository_name:
     type: str
-    required: true
-    description: The Quay namespace (first path component of the images' URI path) that the repository lives in
+    description:
+    - The Quay namespace (first path component of the images' URI path) that the repository lives in
+    - Exactly one of C(repository_name) and C(repositories) must be set.
+  repositories:
+    type: list
+    description:
+    - The repositories to manage the robot account's permission on.
+      Each entry is either a repository name, or a dict with keys
+      C(name), and optionally C(permission) and C(state) (which
+      default to the task-level options of the same name).
+    - Exactly one of C(repository_name) and C(repositories) must be set.
+  exclusive:
+    type: bool
+    default: false
+    description: When using C(repositories), whether to revoke the robot account's permissions on all unlisted repositories of the organization
   robot_account_name:
     type: str
     required: true
-    description: The name of the robot account to configure the permission for
+    description: The name of the robot account to configure the permission for, in C(organization+shortname) form
   permission:
     type: str
     default: "read"
     description: One of "read", "write" or "admin"
+  retry_failed:
+    type: dict
+    description:
+    - The registered result of a previous run of this same task (with
+      C(repositories)). If set, only the repositories that failed in
+      that run are processed again, and C(exclusive) is ignored.
+    - Items are repository names; see C(epfl_si.quay.quay_repositories)
+      for the structure of C(succeeded) and C(failures).
 """
@@ -0,0 +1,80 @@
+# This file is here for ansible-doc purposes **only**. The actual
+# implementation is in ../action/robot_accounts.py as an action plugin
+# (i.e. it runs on the Ansible controller.)
+
+DOCUMENTATION = r"""
+---
+module: robot_accounts
+short_description: Manage many robot accounts of an organization in one task
+description:
+- This is the bulk counterpart of C(epfl_si.quay.robot_account). It
+  fetches the organization's robot accounts (including their tokens)
+  once, then creates and deletes robot accounts as needed.
+
+- The credentials of all the (present) robot accounts are returned in
+  the C(robots) result, in the same format as the
+  C(epfl_si.quay.robot_account) lookup plugin returns; so there is
+  no need to look them up afterwards. You will probably want to set
+  C(no_log) on the task.
+
+- "This action plugin reads from the following Ansible variables:"
+
+- C(ansible_quay_hostname)
+- The hostname of the Quay server to send REST API calls to.
+
+- C(ansible_quay_bearer_token)
+- The bearer token to pass in every REST API call to C(ansible_quay_hostname).
+
+options:
+  state:
+    type: str
+    default: V(present)
+    description: The default desired postcondition for the entries of C(robots), either V(present) or V(absent)
+  organization:
+    type: str
+    required: true
+    description: The Quay namespace in which the robot accounts live
+  robots:
+    type: list
+    required: true
+    description:
+    - The robot accounts to manage. Each entry is either a short name
+      (without the C(namespace+) prefix), or a dict with keys
+      C(short_name), and optionally C(state) and C(description).
+  prune:
+    type: bool
+    default: false
+    description: Whether to delete the organization's robot accounts that are not listed in C(robots)
+  retry_failed:
+    type: dict
+    description:
+    - The registered result of a previous run of this same task. If
+      set, only the robots that failed in that run are processed
+      again, and C(prune) is ignored.
+    - Items are robot short names; see C(epfl_si.quay.quay_repositories)
+      for the structure of C(succeeded) and C(failures).
+"""
+
+EXAMPLES = r"""
+- name: Robot accounts
+  epfl_si.quay.robot_accounts:
+    organization: myorg
+    robots:
+      - puller
+      - pusher
+  register: _robots
+  no_log: true
+
+- name: "`Secret/quay-pullers`"
+  kubernetes.core.k8s:
+    definition:
+      apiVersion: v1
+      kind: Secret
+      metadata:
+        name: quay-puller
+        namespace: my-namespace
+      type: kubernetes.io/dockerconfigjson
+      stringData:
+        .dockerconfigjson: >-
+          {{ _robots.robots[0] | epfl_si.quay.format_docker_config_json | string }}
+"""
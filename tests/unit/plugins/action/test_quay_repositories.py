@@ -0,0 +1,96 @@
+from ansible_collections.epfl_si.actions.plugins.module_utils.ansible_api import AnsibleResults
+from ansible_collections.epfl_si.quay.plugins.action.quay_repositories import ActionModule
+from ansible_collections.epfl_si.quay.plugins.module_utils.state_snapshot import StateSnapshot
+
+
+class FakeResponse:
+    def __init__ (self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+
+    def json (self):
+        return self._data
+
+
+class FakeQuay:
+    """Just enough of `QuayRequests` to create, list and delete repositories without mirrors."""
+    def __init__ (self):
+        self.repositories = {}
+
+    def paginate (self, endpoint, field, params=None, prefetch=False):
+        return [dict(repository, name=name) for (name, repository) in self.repositories.items()]
+
+    def get_cached (self, endpoint):
+        name = endpoint.split("/")[-1]
+        return FakeResponse(200, dict(self.repositories[name], name=name))
+
+    def post (self, endpoint, json=None):
+        self.repositories[json["repository"]] = dict(
+            description=json["description"], is_public=json["visibility"] == "public")
+        return FakeResponse(201)
+
+    def put (self, endpoint, json=None):
+        self.repositories[endpoint.split("/")[-1]].update(json)
+        return FakeResponse(200)
+
+    def delete (self, endpoint):
+        del self.repositories[endpoint.split("/")[-1]]
+        return FakeResponse(204)
+
+
+class QuayRepositoriesAction (ActionModule):
+    quay_hostname = "quay.example.com"
+
+    def __init__ (self, quay, snapshot, **args):
+        self.args = args
+        self.organization = args["organization"]
+        self.result = AnsibleResults.empty()
+        self._quay = quay
+        self._snapshot = snapshot
+
+    @property
+    def quay_request (self):
+        return self._quay
+
+    @property
+    def quay_state_snapshot (self):
+        return self._snapshot
+
+    def quay_setting (self, name, default=None, type=str):
+        return default
+
+
+def run (quay, snapshot_path, **args):
+    action = QuayRepositoriesAction(quay, StateSnapshot(snapshot_path), organization="myorg", **args)
+    action.perform_changes()
+    return action.result
+
+
+def test_recreate_after_prune (tmp_path):
+    quay = FakeQuay()
+    snapshot_path = str(tmp_path / "snapshot.json")
+    desired = [dict(name="x", description="X")]
+
+    run(quay, snapshot_path, repositories=desired)
+    assert "x" in quay.repositories
+    run(quay, snapshot_path, repositories=[], prune=True)
+    assert "x" not in quay.repositories
+
+    result = run(quay, snapshot_path, repositories=desired)
+    assert "x" in quay.repositories
+    assert result["changed"]
+
+
+def test_out_of_band_deletion_is_noticed (tmp_path):
+    quay = FakeQuay()
+    snapshot_path = str(tmp_path / "snapshot.json")
+    desired = [dict(name="x", description="X")]
+
+    run(quay, snapshot_path, repositories=desired)
+    del quay.repositories["x"]
+    # Nothing to read from Quay, as far as the snapshot is concerned:
+    run(quay, snapshot_path, repositories=desired)
+    assert "x" not in quay.repositories
+    # ... until another repository needs the listing anyway:
+    run(quay, snapshot_path, repositories=desired + [dict(name="y", description="Y")])
+    assert "x" in quay.repositories
@@ -0,0 +1,71 @@
+import threading
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.executor import QuayExecutor
+
+
+def test_outcomes_are_keyed_by_lane_in_submission_order ():
+    executor = QuayExecutor(max_in_flight=4)
+    for lane in ("c", "a", "b"):
+        executor.submit(lane, str.upper, lane)
+    outcomes = executor.run()
+    assert list(outcomes) == ["c", "a", "b"]
+    assert [(o.lane, o.value, o.error) for o in outcomes.values()] == [
+        ("c", "C", None), ("a", "A", None), ("b", "B", None)]
+
+
+def test_calls_in_the_same_lane_run_in_order_and_share_one_outcome ():
+    calls = []
+    executor = QuayExecutor(max_in_flight=4)
+    for i in range(5):
+        executor.submit("lane", lambda i: calls.append(i) or i, i)
+    executor.submit("other", lambda: "other")
+    outcomes = executor.run()
+    assert calls == [0, 1, 2, 3, 4]
+    assert len(outcomes) == 2
+    assert outcomes["lane"].value == 4
+
+
+def test_a_lane_stops_at_its_first_error ():
+    calls = []
+    error = RuntimeError("boom")
+
+    def fail ():
+        raise error
+
+    executor = QuayExecutor(max_in_flight=2)
+    executor.submit("lane", calls.append, 1)
+    executor.submit("lane", fail)
+    executor.submit("lane", calls.append, 2)
+    executor.submit("other", calls.append, 3)
+    outcomes = executor.run()
+    assert outcomes["lane"].error is error
+    assert outcomes["other"].error is None
+    assert sorted(calls) == [1, 3]
+
+
+def test_lanes_run_concurrently_up_to_max_in_flight ():
+    lock = threading.Lock()
+    barrier = threading.Barrier(3, timeout=5)
+    in_flight = [0, 0]   # current, peak
+
+    def work ():
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        barrier.wait()
+        with lock:
+            in_flight[0] -= 1
+
+    executor = QuayExecutor(max_in_flight=3)
+    for lane in range(6):
+        executor.submit(lane, work)
+    outcomes = executor.run()
+    assert all(o.error is None for o in outcomes.values())
+    assert in_flight[1] == 3
+
+
+def test_the_executor_can_be_run_again ():
+    executor = QuayExecutor()
+    executor.submit("a", lambda: 1)
+    assert executor.run()["a"].value == 1
+    assert executor.run() == {}
@@ -0,0 +1,45 @@
+import pytest
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.mirror_rules import canonical_tags, merge_tags, desired_root_rule
+
+
+def test_canonical_tags ():
+    assert canonical_tags(None) == []
+    assert canonical_tags("v1, v2,,v1") == ["v1", "v2"]
+    assert canonical_tags(["v1,v2", " v3 ", "v2"]) == ["v1", "v2", "v3"]
+
+
+def test_replace_with_the_same_set_keeps_the_current_order ():
+    assert merge_tags(["v2", "v1"], ["v1", "v2"]) == ["v2", "v1"]
+    assert merge_tags("v2,v1", "v1, v2, v1") == ["v2", "v1"]
+
+
+def test_replace_with_another_set ():
+    assert merge_tags(["v2", "v1"], ["v1", "v3"]) == ["v1", "v3"]
+
+
+def test_add ():
+    assert merge_tags(["v1", "v2"], ["v3", "v1"], mode="add") == ["v1", "v2", "v3"]
+
+
+def test_remove ():
+    assert merge_tags(["v1", "v2", "v3"], ["v2"], mode="remove") == ["v1", "v3"]
+
+
+def test_remove_tags_applies_after_any_mode ():
+    assert merge_tags(["v1"], ["v1", "v2"], mode="add", remove="v1") == ["v2"]
+    assert merge_tags(["v1"], ["v1", "v2"], remove=["v2"]) == ["v1"]
+
+
+def test_unknown_mode ():
+    with pytest.raises(ValueError):
+        merge_tags([], [], mode="sideways")
+
+
+def test_root_rule_of_another_kind_is_replaced_outright ():
+    current = dict(rule_kind="tag_glob_csv", rule_value=["v1"])
+    assert desired_root_rule(dict(tags=["v2"], tags_mode="add"), current) == dict(
+        rule_kind="tag_glob_csv", rule_value=["v1", "v2"])
+    assert desired_root_rule(dict(tags=["v2"], tags_mode="add"),
+                             dict(rule_kind="other", rule_value="x")) == dict(
+        rule_kind="tag_glob_csv", rule_value=["v2"])
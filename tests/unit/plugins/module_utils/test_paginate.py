@@ -0,0 +1,58 @@
+from ansible_collections.epfl_si.quay.plugins.module_utils.quay_actions import paginate
+
+
+class FakeResponse:
+    def __init__ (self, data):
+        self._data = data
+
+    def json (self):
+        return self._data
+
+
+def fake_get (pages, key_param):
+    """A `get` function that serves `pages`, indexed by the `key_param` request parameter."""
+    calls = []
+
+    def get (endpoint, params=None):
+        calls.append(dict(params))
+        return FakeResponse(pages[params.get(key_param)])
+    get.calls = calls
+    return get
+
+
+def test_next_page_tokens ():
+    get = fake_get({None: dict(repositories=[1, 2], next_page="abc"),
+                    "abc": dict(repositories=[3])}, "next_page")
+    assert list(paginate(get, "/api/v1/repository", "repositories",
+                         params=dict(namespace="myorg"))) == [1, 2, 3]
+    assert get.calls == [dict(namespace="myorg"), dict(namespace="myorg", next_page="abc")]
+
+
+def test_page_numbers ():
+    get = fake_get({None: dict(tags=["a"], page=1, has_additional=True),
+                    2: dict(tags=["b"], page=2, has_additional=True),
+                    3: dict(tags=["c"], page=3, has_additional=False)}, "page")
+    assert list(paginate(get, "/tags", "tags")) == ["a", "b", "c"]
+
+
+def test_prefetch_yields_the_same ():
+    pages = {None: dict(tags=["a"], page=1, has_additional=True),
+             2: dict(tags=["b"], page=2, has_additional=False)}
+    assert list(paginate(fake_get(pages, "page"), "/tags", "tags", prefetch=True)) == ["a", "b"]
+
+
+def test_unpaginated_dict_of_items ():
+    get = fake_get({None: dict(permissions={"alice": dict(role="read")})}, "page")
+    assert list(paginate(get, "/permissions/user/", "permissions")) == [dict(role="read")]
+
+
+def test_missing_key ():
+    assert list(paginate(fake_get({None: dict()}, "page"), "/robots", "robots")) == []
+
+
+def test_pages_are_fetched_lazily ():
+    get = fake_get({None: dict(tags=["a"], page=1, has_additional=True),
+                    2: dict(tags=["b"], page=2, has_additional=False)}, "page")
+    items = paginate(get, "/tags", "tags")
+    assert next(items) == "a"
+    assert len(get.calls) == 1
@@ -0,0 +1,87 @@
+import json
+import time
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.state_snapshot import StateSnapshot
+
+
+def test_record_and_reload (tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    snapshot = StateSnapshot(path)
+    h = snapshot.desired_hash(dict(state="present", description="A"))
+    snapshot.record("quay.example.com/myorg/a", h, dict(exists=True))
+    assert snapshot.is_current("quay.example.com/myorg/a", h)
+    snapshot.save()
+
+    reloaded = StateSnapshot(path)
+    assert reloaded.is_current("quay.example.com/myorg/a", h)
+    assert reloaded.get("quay.example.com/myorg/a") == dict(exists=True)
+    assert not reloaded.is_current("quay.example.com/myorg/a",
+                                   snapshot.desired_hash(dict(state="present", description="B")))
+    assert reloaded.get("quay.example.com/myorg/b") is None
+
+
+def test_desired_hash_ignores_key_order ():
+    assert (StateSnapshot.desired_hash(dict(a=1, b=2))
+            == StateSnapshot.desired_hash(dict(b=2, a=1)))
+
+
+def test_forget (tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    snapshot = StateSnapshot(path)
+    snapshot.record("a", "h", dict(exists=True))
+    snapshot.record("b", "h", dict(exists=True))
+    snapshot.save()
+
+    snapshot = StateSnapshot(path)
+    snapshot.forget("a")
+    assert not snapshot.is_current("a", "h")
+    assert snapshot.get("a") is None
+    snapshot.save()
+    assert set(StateSnapshot(path)._resources) == {"b"}
+
+
+def test_full_verify (tmp_path):
+    snapshot = StateSnapshot(str(tmp_path / "snapshot.json"), full_verify=True)
+    snapshot.record("a", "h", None)
+    assert not snapshot.is_current("a", "h")
+
+
+def test_ttl_is_spread_over_ten_percent (tmp_path, monkeypatch):
+    keys = [f"quay.example.com/myorg/repo{i}" for i in range(200)]
+    spreads = [StateSnapshot._spread(key) for key in keys]
+    assert all(0.9 <= spread <= 1.1 for spread in spreads)
+    assert max(spreads) - min(spreads) > 0.1
+    assert spreads == [StateSnapshot._spread(key) for key in keys]   # Stable
+
+    snapshot = StateSnapshot(str(tmp_path / "snapshot.json"), ttl=1000)
+    now = time.time()
+    for key in keys:
+        snapshot.record(key, "h", None)
+    monkeypatch.setattr(time, "time", lambda: now + 950)
+    current = [key for key in keys if snapshot.is_current(key, "h")]
+    assert 0 < len(current) < len(keys)
+    monkeypatch.setattr(time, "time", lambda: now + 1101)
+    assert not any(snapshot.is_current(key, "h") for key in keys)
+
+
+def test_concurrent_writers_merge (tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    first = StateSnapshot(path)
+    second = StateSnapshot(path)
+    first.record("a", "h", None)
+    second.record("b", "h", None)
+    first.save()
+    second.save()
+    assert set(json.load(open(path))["resources"]) == {"a", "b"}
+
+
+def test_unreadable_or_foreign_files_start_over (tmp_path):
+    path = tmp_path / "snapshot.json"
+    path.write_text("{not json")
+    assert StateSnapshot(str(path))._resources == {}
+    path.write_text(json.dumps(dict(version=999, resources=dict(a={}))))
+    assert StateSnapshot(str(path))._resources == {}
+    path.write_text(json.dumps(dict(version=1, resources=dict(
+        a=dict(hash="h", at=0),   # No state: written by an older version
+        b=dict(hash="h", at=0, state=None)))))
+    assert set(StateSnapshot(str(path))._resources) == {"b"}
@@ -0,0 +1,64 @@
+import pytest
+
+from ansible_collections.epfl_si.quay.plugins.module_utils.tag_retention import RetentionPolicy
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+def tags (*ages_in_days):
+    """A tag listing, newest first, with tags named after their age."""
+    return [dict(name=f"t{age}", start_ts=NOW - age * DAY) for age in ages_in_days]
+
+
+def expired_names (policy, listing):
+    return [tag["name"] for tag in policy.expired(listing)]
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(),
+    dict(keep_last=0),
+    dict(keep_last=-1, keep_days=3),
+    dict(keep_days=0),
+])
+def test_policies_that_would_expire_everything_are_rejected (kwargs):
+    with pytest.raises(ValueError):
+        RetentionPolicy(now=NOW, **kwargs)
+
+
+def test_keep_last ():
+    policy = RetentionPolicy(keep_last=2, now=NOW)
+    assert expired_names(policy, tags(0, 1, 2, 3)) == ["t2", "t3"]
+
+
+def test_keep_days ():
+    policy = RetentionPolicy(keep_days=2, now=NOW)
+    assert expired_names(policy, tags(0, 1, 3, 4)) == ["t3", "t4"]
+
+
+def test_either_criterion_keeps_a_tag ():
+    policy = RetentionPolicy(keep_last=1, keep_days=3, now=NOW)
+    assert expired_names(policy, tags(0, 1, 2, 4, 5)) == ["t4", "t5"]
+
+
+def test_protected_tags_are_kept_and_not_counted ():
+    policy = RetentionPolicy(keep_last=1, protect=["latest", "v*"], now=NOW)
+    listing = [dict(name="latest", start_ts=NOW), dict(name="v1.0", start_ts=NOW - 400 * DAY)]
+    listing += tags(1, 2)
+    assert expired_names(policy, listing) == ["t2"]
+
+
+def test_tags_without_a_timestamp_are_kept ():
+    policy = RetentionPolicy(keep_days=1, now=NOW)
+    assert expired_names(policy, [dict(name="mystery")]) == []
+
+
+def test_listing_is_consumed_lazily ():
+    def endless ():
+        age = 0
+        while True:
+            yield dict(name=f"t{age}", start_ts=NOW - age * DAY)
+            age += 1
+
+    expired = RetentionPolicy(keep_last=3, now=NOW).expired(endless())
+    assert next(expired)["name"] == "t3"